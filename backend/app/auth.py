@@ -1,22 +1,90 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 from .config import settings
-from .database import get_db
+from .database import AsyncSessionLocal, SessionLocal, async_read_session_factory, read_session_factory
+from .bus import bus
+from .cache import TTLCache
 from . import models
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def password_context():
+    # Built on first use: passlib is only needed to log in or register.
+    # min == max rounds makes needs_update() flag hashes made with any other cost
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Maps a raw bearer token to a detached snapshot of the user it resolves to
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+def _get_hash_executor():
+    global _hash_executor
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            # spawn, not fork: the server process already runs threads
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _hash_executor
+
+def shutdown_hash_executor():
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(cancel_futures=True)
+            _hash_executor = None
+
+def _run_hashing(fn, *args):
+    # bcrypt is CPU bound; run it in a worker process so it scales across cores
+    executor = _get_hash_executor()
+    if executor is None:
+        return fn(*args)
+    return executor.submit(fn, *args).result()
+
+# Module-level so they pickle by reference into the worker processes
+def _verify(plain_password, hashed_password):
+    return password_context().verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password, hashed_password):
+    return password_context().verify_and_update(plain_password, hashed_password)
+
+def _hash(password):
+    return password_context().hash(password)
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hashing(_verify, plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash
+    was made with a different bcrypt cost than ``BCRYPT_ROUNDS``."""
+    return _run_hashing(_verify_and_update, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _run_hashing(_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,21 +96,143 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _snapshot_user(user: models.User) -> models.User:
+    # Column values only, so the copy can be merged into any session without a SELECT
+    columns = {column.key: getattr(user, column.key) for column in models.User.__table__.columns}
+    snapshot = models.User(**columns)
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def invalidate_user(user_id: int):
+    """Drop cached tokens of ``user_id`` in every worker."""
+    bus.publish("user", user_id)
+
+def _drop_user(user_id: int):
+    token_cache.discard_where(lambda user: user.id == user_id)
+
+bus.subscribe("user", _drop_user, reset=token_cache.clear)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Dropped here right away; broadcast once the change is committed
+    _drop_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _broadcast_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_users", None)
+
+def token_cache_stats():
+    stats = token_cache.stats()
+    stats["user_lookups"] = stats.pop("loads")
+    stats["avg_user_lookup_ms"] = stats.pop("avg_load_ms")
+    return stats
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+def token_subject(token: str) -> Optional[str]:
+    """``sub`` of a valid token, or ``None``; no database access."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached.email
+    try:
+        return _decode_token(token)["sub"]
+    except HTTPException:
+        return None
+
+# Stream tokens may only open event streams, and access tokens may not
+STREAM_PURPOSE = "stream"
+
+def create_stream_token(email: str) -> str:
+    return create_access_token(
+        data={"sub": email, "purpose": STREAM_PURPOSE},
+        expires_delta=timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS),
+    )
+
+def _decode_access_token(token: str) -> dict:
+    payload = _decode_token(token)
+    if payload.get("purpose") is not None:
+        raise _credentials_exception()
+    return payload
+
+def _remember_user(token: str, payload: dict, user: models.User) -> models.User:
+    # Never keep a token around past its own expiry
+    token_cache.set(token, user, ttl=payload.get("exp", 0) - time.time())
+    return user
+
+# Users are resolved from the token cache, or else through a read session
+# (replica when there is one), never by opening a primary session per request.
+# The returned user is a detached snapshot: column values only
+def _load_user(request: Request, email: str) -> models.User:
+    start = time.perf_counter()
+    factory = read_session_factory(request)
+    with factory() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+    if user is None and factory is not SessionLocal:
+        # The replica may not have a just-registered user yet
+        with SessionLocal() as db:
+            user = db.query(models.User).filter(models.User.email == email).first()
+    token_cache.record_load(time.perf_counter() - start)
+    if user is None:
+        raise _credentials_exception()
+    return _snapshot_user(user)
+
+async def _load_user_async(request: Request, email: str) -> models.User:
+    start = time.perf_counter()
+    statement = select(models.User).where(models.User.email == email)
+    factory = async_read_session_factory(request)
+    async with factory() as db:
+        user = (await db.execute(statement)).scalars().first()
+    if user is None and factory is not AsyncSessionLocal:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(statement)).scalars().first()
+    token_cache.record_load(time.perf_counter() - start)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    return _snapshot_user(user)
+
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = _decode_access_token(token)
+    return _remember_user(token, payload, _load_user(request, payload["sub"]))
+
+async def get_current_user_async(request: Request, token: str = Depends(oauth2_scheme)):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = _decode_access_token(token)
+    return _remember_user(token, payload, await _load_user_async(request, payload["sub"]))
+
+def get_stream_user(request: Request, token: str = Query("")):
+    """User of an event stream. EventSource cannot send headers, so the token
+    comes as ``?token=``, where access logs may record it: only a short-lived
+    stream token (``create_stream_token``) is accepted. Stream tokens are not
+    cached, the connection being long-lived."""
+    payload = _decode_token(token)
+    if payload.get("purpose") != STREAM_PURPOSE:
+        raise _credentials_exception()
+    return _load_user(request, payload["sub"])
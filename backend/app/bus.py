@@ -0,0 +1,272 @@
+"""Invalidation bus keeping per-process caches coherent across workers.
+
+Writers call ``bus.publish(channel, payload)`` once their transaction has
+committed. The handlers subscribed to ``channel`` run right away in the
+publishing process and, through the backend chosen by ``CACHE_BUS``, in
+every other worker:
+
+- ``local``: this process only (one worker; the default)
+- ``db``: rows in ``cache_events`` polled every ``CACHE_BUS_POLL_SECONDS``;
+  for several workers sharing one SQLite file, where commits are serialised
+  so ids are seen in order
+- ``postgres``: LISTEN/NOTIFY on the primary database
+- ``redis``: pub/sub on any Redis-compatible server at ``CACHE_BUS_URL``
+  (needs the redis package)
+
+A worker that may have missed messages (its listener reconnected, or it fell
+more than ``RETAINED_EVENTS`` behind) resets every subscribed cache instead.
+
+Backends may limit the size of a message (``pg_notify`` payloads must stay
+under 8000 bytes). ``publish_items`` sends a list payload in as many messages
+as that takes; a payload that cannot be split to fit is replaced by a reset
+message, which makes the other workers reset their caches.
+"""
+import json
+import logging
+import select
+import threading
+import uuid
+from sqlalchemy import delete, func, insert, text
+from . import models
+from .config import settings
+from .database import engine
+
+try:
+    import redis
+except ImportError:  # optional, only for CACHE_BUS=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "lms_cache"
+RECONNECT_SECONDS = 1.0
+RETAINED_EVENTS = 10000
+CLEANUP_EVERY = 100  # polls
+
+_events = models.CacheEvent.__table__
+
+
+class Bus:
+    """Delivers messages to this process's handlers; subclasses also forward
+    them to the other workers and listen for theirs on a background thread."""
+    name = "local"
+    # Largest message in bytes the backend carries; None for no limit
+    max_message = None
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers = {}
+        self._resets = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self.send_errors = 0
+
+    def subscribe(self, channel: str, handler, reset=None):
+        """Call ``handler(payload)`` for each message on ``channel``, and
+        ``reset()`` when messages may have been missed."""
+        self._handlers.setdefault(channel, []).append(handler)
+        if reset is not None:
+            self._resets.append(reset)
+
+    def publish(self, channel: str, payload):
+        """Apply ``payload`` here and broadcast it; ``payload`` must be JSON-serializable."""
+        self._dispatch(channel, payload)
+        self.published += 1
+        self._broadcast(channel, self._messages(channel, payload, split=False))
+
+    def publish_items(self, channel: str, items: list):
+        """Like ``publish`` for a list whose items stand alone: other workers may
+        get it as several consecutive lists when one message would be too large."""
+        self._dispatch(channel, items)
+        self.published += 1
+        self._broadcast(channel, self._messages(channel, items, split=True))
+
+    def _messages(self, channel: str, payload, split: bool) -> list:
+        message = json.dumps({"origin": self.origin, "channel": channel, "payload": payload})
+        size = len(message.encode())
+        if self.max_message is None or size <= self.max_message:
+            return [message]
+        if split and len(payload) > 1:
+            half = len(payload) // 2
+            return self._messages(channel, payload[:half], True) + self._messages(channel, payload[half:], True)
+        logger.warning("%s message of %d bytes is too large for the %s bus; sending a reset", channel, size, self.name)
+        return [json.dumps({"origin": self.origin, "reset": True})]
+
+    def _broadcast(self, channel: str, messages: list):
+        try:
+            for message in messages:
+                self._send(message)
+        except Exception:
+            # The write is already committed; other workers catch up when their entries expire
+            self.send_errors += 1
+            logger.exception("Could not broadcast %s invalidation over the %s bus", channel, self.name)
+
+    def start(self):
+        if type(self)._listen is Bus._listen or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"cache-bus-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "send_errors": self.send_errors,
+        }
+
+    def _send(self, message: str):
+        pass
+
+    def _listen(self, reconnect: bool):
+        """Subscribe, call ``_reset`` if ``reconnect``, then ``_receive`` until stopped."""
+
+    def _run(self):
+        reconnect = False
+        while not self._stop.is_set():
+            try:
+                self._listen(reconnect)
+            except Exception:
+                logger.exception("Cache bus %s listener failed; reconnecting", self.name)
+                reconnect = True
+                self._stop.wait(RECONNECT_SECONDS)
+
+    def _dispatch(self, channel: str, payload):
+        for handler in self._handlers.get(channel, ()):
+            handler(payload)
+
+    def _receive(self, message: str):
+        data = json.loads(message)
+        if data["origin"] == self.origin:
+            return
+        self.received += 1
+        if data.get("reset"):
+            self._reset()
+            return
+        self._dispatch(data["channel"], data["payload"])
+
+    def _reset(self):
+        self.resets += 1
+        for reset in self._resets:
+            reset()
+
+
+class DatabaseBus(Bus):
+    name = "db"
+
+    def __init__(self, bind, interval: float):
+        super().__init__()
+        self.bind = bind
+        self.interval = interval
+
+    def _send(self, message: str):
+        with self.bind.begin() as connection:
+            connection.execute(insert(_events), {"message": message})
+
+    def _listen(self, reconnect: bool):
+        with self.bind.connect() as connection:
+            last_id = connection.execute(func.max(_events.c.id).select()).scalar() or 0
+        if reconnect:
+            self._reset()
+        polls = 0
+        while not self._stop.wait(self.interval):
+            with self.bind.connect() as connection:
+                rows = connection.execute(
+                    _events.select().where(_events.c.id > last_id).order_by(_events.c.id)
+                ).all()
+                if rows and rows[0].id > last_id + 1:
+                    # Ids are contiguous and never reused on SQLite (AUTOINCREMENT):
+                    # the rows in between were cleaned up unseen
+                    self._reset()
+                for row in rows:
+                    self._receive(row.message)
+                    last_id = row.id
+                polls += 1
+                if polls % CLEANUP_EVERY == 0:
+                    connection.execute(delete(_events).where(_events.c.id <= last_id - RETAINED_EVENTS))
+                    connection.commit()
+
+
+class PostgresBus(Bus):
+    name = "postgres"
+    # NOTIFY payloads must be shorter than 8000 bytes
+    max_message = 7999
+
+    def __init__(self, bind):
+        super().__init__()
+        self.bind = bind
+
+    def _send(self, message: str):
+        with self.bind.begin() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :message)"), {"channel": CHANNEL, "message": message})
+
+    def _listen(self, reconnect: bool):
+        # A dedicated connection, taken out of the pool for as long as it listens
+        connection = self.bind.raw_connection()
+        connection.detach()
+        try:
+            listener = connection.driver_connection
+            listener.autocommit = True
+            listener.cursor().execute(f"LISTEN {CHANNEL}")
+            if reconnect:
+                self._reset()
+            while not self._stop.is_set():
+                if select.select([listener], [], [], 1.0) == ([], [], []):
+                    continue
+                listener.poll()
+                while listener.notifies:
+                    self._receive(listener.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+
+class RedisBus(Bus):
+    name = "redis"
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("CACHE_BUS=redis needs the redis package")
+        super().__init__()
+        self.client = redis.Redis.from_url(url)
+
+    def _send(self, message: str):
+        self.client.publish(CHANNEL, message)
+
+    def _listen(self, reconnect: bool):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            if reconnect:
+                self._reset()
+            while not self._stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    self._receive(message["data"].decode())
+        finally:
+            pubsub.close()
+
+
+def create_bus(kind: str) -> Bus:
+    if kind == "local":
+        return Bus()
+    if kind == "db":
+        return DatabaseBus(engine, settings.CACHE_BUS_POLL_SECONDS)
+    if kind == "postgres":
+        return PostgresBus(engine)
+    if kind == "redis":
+        return RedisBus(settings.CACHE_BUS_URL)
+    raise ValueError(f"Unknown CACHE_BUS {kind!r}; expected local, db, postgres or redis")
+
+
+bus = create_bus(settings.CACHE_BUS)
@@ -5,5 +5,103 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 30
+    # Event stream tokens travel in the URL (EventSource cannot send headers),
+    # so they only open streams and expire quickly
+    STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
 
-settings = Settings()
\ No newline at end of file
+    # Apply pending migrations when the app starts. Deployments run
+    # `python -m app.migrations` once and start the workers with this off
+    AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
+    # Worker threads FastAPI uses to run sync endpoints and dependencies
+    THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+    # Optional read replica for read-only routes; a client that wrote keeps
+    # reading from the primary for READ_YOUR_WRITES_SECONDS (0 disables that)
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+    # Connection pool (ignored for in-memory SQLite)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # SQLite pragmas applied to every new connection
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Reverse proxies in front of the app that append the address they saw to
+    # X-Forwarded-For (1 on Railway). Clients are keyed by the entry the outermost
+    # one appended: entries left of it are whatever the client sent. 0 uses the
+    # socket peer
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+    # Admission control (app/limits.py): per-client token buckets answering
+    # 429 (rate 0 disables) and per-process in-flight caps answering 503.
+    # Buckets live in each process too: with N workers/instances a client may
+    # get up to N times these rates, so set them to the per-process share
+    RATE_LIMITING = os.getenv("RATE_LIMITING", "true").lower() == "true"
+    # Login and registration, per client address: room for a classroom behind one NAT
+    AUTH_RATE_PER_MINUTE = float(os.getenv("AUTH_RATE_PER_MINUTE", "30"))
+    AUTH_BURST = int(os.getenv("AUTH_BURST", "30"))
+    AUTH_MAX_CONCURRENT = int(os.getenv("AUTH_MAX_CONCURRENT", "16"))
+    # Solution submissions, per student
+    SUBMIT_RATE_PER_MINUTE = float(os.getenv("SUBMIT_RATE_PER_MINUTE", "30"))
+    SUBMIT_BURST = int(os.getenv("SUBMIT_BURST", "10"))
+    # With SUBMISSION_BATCHING the cap is this plus SUBMISSION_BATCH_SIZE:
+    # submissions waiting on the group commit hold no thread or connection,
+    # so a full batch may queue on top of the checks in progress
+    SUBMIT_MAX_CONCURRENT = int(os.getenv("SUBMIT_MAX_CONCURRENT", "24"))
+    # Solution listings and searches, per teacher
+    SOLUTIONS_RATE_PER_MINUTE = float(os.getenv("SOLUTIONS_RATE_PER_MINUTE", "120"))
+    SOLUTIONS_BURST = int(os.getenv("SOLUTIONS_BURST", "30"))
+    SOLUTIONS_MAX_CONCURRENT = int(os.getenv("SOLUTIONS_MAX_CONCURRENT", "8"))
+
+    # Password hashing: bcrypt cost, and worker processes (0 hashes inline)
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+    # Verified-token cache used by auth.get_current_user (size 0 disables it)
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+    # Serialized catalog/task list responses (size 0 disables)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+    # Enrollment membership checks (size 0 disables)
+    ENROLLMENT_CACHE_SIZE = int(os.getenv("ENROLLMENT_CACHE_SIZE", "50000"))
+    ENROLLMENT_CACHE_TTL_SECONDS = float(os.getenv("ENROLLMENT_CACHE_TTL_SECONDS", "60"))
+    # Broadcasts cache invalidations to the other workers: local (one
+    # worker), db (cache_events table, polled), postgres (LISTEN/NOTIFY) or
+    # redis (pub/sub at CACHE_BUS_URL)
+    CACHE_BUS = os.getenv("CACHE_BUS", "local")
+    CACHE_BUS_URL = os.getenv("CACHE_BUS_URL", "redis://localhost:6379/0")
+    CACHE_BUS_POLL_SECONDS = float(os.getenv("CACHE_BUS_POLL_SECONDS", "0.5"))
+    # Server-sent event feeds (app/events.py): open streams per process,
+    # events buffered per slow client, and idle keepalive interval
+    EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "10000"))
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+    # Group commit for solution submissions: rows are written by one writer
+    # thread in batches of up to SIZE rows or WAIT_MS after the first arrives
+    SUBMISSION_BATCHING = os.getenv("SUBMISSION_BATCHING", "false").lower() == "true"
+    SUBMISSION_BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", "100"))
+    SUBMISSION_BATCH_WAIT_MS = float(os.getenv("SUBMISSION_BATCH_WAIT_MS", "10"))
+    SUBMISSION_BATCH_TIMEOUT_SECONDS = float(os.getenv("SUBMISSION_BATCH_TIMEOUT_SECONDS", "30"))
+
+    # Solution bodies: content-addressed store in the database ("db") or under
+    # CONTENT_STORE_PATH ("fs"); zstd when the zstandard package is installed
+    CONTENT_STORE = os.getenv("CONTENT_STORE", "db")
+    CONTENT_STORE_PATH = os.getenv("CONTENT_STORE_PATH", "./content")
+    CONTENT_COMPRESSION = os.getenv("CONTENT_COMPRESSION", "auto")
+    CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+    # Bearer token required by /metrics (unset: open, e.g. behind a private network)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+settings = Settings()
@@ -0,0 +1,176 @@
+"""Content-addressed, compressed storage for solution bodies.
+
+A body is stored once under the SHA-256 of its UTF-8 text, whatever the
+number of solutions referencing it; ``solutions`` keeps only the hash and
+size. Stored blobs start with a one-byte codec tag, so blobs written with
+different ``CONTENT_COMPRESSION`` settings can be read side by side.
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import insert, select
+from . import models
+from .config import settings
+from .database import dialect_name
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+RAW, ZLIB, ZSTD = b"r", b"z", b"s"
+
+
+class MissingContent(LookupError):
+    """Solutions reference bodies the store does not have (answered with 410)."""
+
+
+def _codec():
+    if settings.CONTENT_COMPRESSION == "auto":
+        return ZSTD if zstandard else ZLIB
+    if settings.CONTENT_COMPRESSION == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CONTENT_COMPRESSION=zstd needs the zstandard package")
+        return ZSTD
+    return {"zlib": ZLIB, "none": RAW}[settings.CONTENT_COMPRESSION]
+
+
+def encode(raw: bytes) -> bytes:
+    codec = _codec()
+    if codec == ZSTD:
+        data = zstandard.ZstdCompressor(level=settings.CONTENT_COMPRESSION_LEVEL).compress(raw)
+    elif codec == ZLIB:
+        data = zlib.compress(raw, settings.CONTENT_COMPRESSION_LEVEL)
+    else:
+        data = raw
+    # Short bodies often grow when compressed
+    if len(data) >= len(raw):
+        return RAW + raw
+    return codec + data
+
+
+def decode(blob: bytes) -> bytes:
+    codec, data = blob[:1], blob[1:]
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Stored content is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class DatabaseStore:
+    """Blobs in the ``solution_blobs`` table, written in the caller's transaction."""
+
+    def put(self, db, blobs: Dict[str, bytes]):
+        rows = [{"hash": key, "data": encode(raw)} for key, raw in sorted(blobs.items())]
+        if not rows:
+            return
+        Blob = models.SolutionBlob
+        dialect = dialect_name(db)
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            # Identical bodies are stored once; concurrent writers of the same one don't conflict
+            db.execute(dialect_insert(Blob).on_conflict_do_nothing(index_elements=[Blob.hash]), rows)
+            return
+        existing = set(db.execute(select(Blob.hash).where(Blob.hash.in_(blobs))).scalars())
+        rows = [row for row in rows if row["hash"] not in existing]
+        if rows:
+            db.execute(insert(Blob), rows)
+
+    def get_many(self, db, hashes: Iterable[str]) -> Dict[str, bytes]:
+        Blob = models.SolutionBlob
+        hashes = list(hashes)
+        if not hashes:
+            return {}
+        rows = db.execute(select(Blob.hash, Blob.data).where(Blob.hash.in_(hashes))).all()
+        return {key: decode(data) for key, data in rows}
+
+
+class FileStore:
+    """Blobs as files under ``root/ab/cd/<hash>``.
+
+    Files are written atomically before the database transaction commits; a
+    rolled back submission can leave an unreferenced file behind, never a
+    dangling reference.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, db, blobs: Dict[str, bytes]):
+        for key, raw in blobs.items():
+            path = self.path(key)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(encode(raw))
+            os.replace(tmp, path)
+
+    def get_many(self, db, hashes: Iterable[str]) -> Dict[str, bytes]:
+        blobs = {}
+        for key in set(hashes):
+            try:
+                with open(self.path(key), "rb") as f:
+                    blobs[key] = decode(f.read())
+            except FileNotFoundError:
+                pass
+        return blobs
+
+
+store = FileStore(settings.CONTENT_STORE_PATH) if settings.CONTENT_STORE == "fs" else DatabaseStore()
+
+
+def save(db, texts: List[str]) -> List[Tuple[str, int]]:
+    """Store ``texts`` and return ``(content_hash, content_size)`` for each."""
+    refs = []
+    blobs = {}
+    for text in texts:
+        raw = text.encode("utf-8")
+        key = hashlib.sha256(raw).hexdigest()
+        blobs[key] = raw
+        refs.append((key, len(raw)))
+    store.put(db, blobs)
+    return refs
+
+
+def load(db, hashes: Iterable[str]) -> Dict[str, str]:
+    """Bodies for ``hashes`` in one round trip, as ``{hash: text}``."""
+    return {key: raw.decode("utf-8") for key, raw in store.get_many(db, set(hashes)).items()}
+
+
+def load_all(db, hashes: Iterable[str]) -> Dict[str, str]:
+    """Like ``load``, but raise MissingContent unless every body is found."""
+    hashes = set(hashes)
+    bodies = load(db, hashes)
+    missing = hashes - bodies.keys()
+    if missing:
+        raise MissingContent(sorted(missing))
+    return bodies
+
+
+def attach_rows(db, rows: List[dict]) -> List[dict]:
+    """Replace the content hash in each row's ``content`` with the body."""
+    bodies = load_all(db, [row["content"] for row in rows])
+    for row in rows:
+        row["content"] = bodies[row["content"]]
+    return rows
+
+
+def attach(db, solutions):
+    """Set ``content`` on loaded solutions, fetching every body at once."""
+    bodies = load_all(db, [solution.content_hash for solution in solutions])
+    for solution in solutions:
+        solution.content = bodies[solution.content_hash]
+    return solutions
@@ -1,27 +1,235 @@
-from sqlalchemy import create_engine
+import time
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from . import metrics
+from .cache import TTLCache
 from .config import settings
 
+# Async drivers and the sync driver used for the same database
+ASYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
+
+# ...and the other way round, for the replica in async mode
+ASYNC_SCHEMES = {sync: async_scheme for async_scheme, sync in ASYNC_DRIVERS.items()}
+
+# Requests that do not change data
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def normalize_url(url: str) -> str:
+    # If it's PostgreSQL and starts with postgres://, change to postgresql://
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
 # Handle both SQLite and PostgreSQL
-database_url = settings.DATABASE_URL
+database_url = normalize_url(settings.DATABASE_URL)
+
+# An async driver in DATABASE_URL enables async mode; the sync engine is kept
+# for scripts, migrations and the existing routers
+scheme, _, rest = database_url.partition("://")
+is_async = scheme in ASYNC_DRIVERS
+sync_database_url = f"{ASYNC_DRIVERS[scheme]}://{rest}" if is_async else database_url
+is_sqlite = sync_database_url.startswith("sqlite")
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        # In-memory databases use a single-connection pool without these knobs
+        if ":memory:" in url or url.rstrip("/").endswith(":"):
+            return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+class QueryStats:
+    """Statements issued and time spent in the database for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Set per request by middleware.QueryStatsMiddleware; shared with worker threads
+current_query_stats: ContextVar = ContextVar("current_query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+def instrument(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+
+
+# Checkout wait, through public events: a session's first statement starts
+# the clock, ``after_begin`` (the connection has been checked out) stops it.
+# Timeouts are counted where they surface (see main.py)
+def _start_checkout_clock(orm_execute_state):
+    session = orm_execute_state.session
+    if not session.in_transaction():
+        session.info["checkout_started"] = time.perf_counter()
+
+
+def _observe_checkout_wait(session, transaction, connection):
+    started = session.info.pop("checkout_started", None)
+    if started is not None and isinstance(connection.engine.pool, QueuePool):
+        metrics.pool_wait.observe(time.perf_counter() - started)
+
 
-# If it's PostgreSQL and starts with postgres://, change to postgresql://
-if database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
+event.listen(Session, "do_orm_execute", _start_checkout_clock)
+event.listen(Session, "after_begin", _observe_checkout_wait)
 
-engine = create_engine(
-    database_url,
-    connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {}
-)
+
+sync_options = engine_options(sync_database_url)
+engine = create_engine(sync_database_url, **sync_options)
+instrument(engine)
+if isinstance(engine.pool, QueuePool):
+    metrics.registry.register(metrics.Gauge(
+        "db_pool_checked_out", "DB connections currently checked out", function=lambda: engine.pool.checkedout()
+    ))
+    metrics.registry.register(metrics.Gauge(
+        "db_pool_capacity", "Pool size plus allowed overflow",
+        function=lambda: settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    ))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only routes use the replica when one is configured; the schema there
+# comes from replication, migrations only ever run against the primary
+replica_engine = None
+ReplicaSessionLocal = SessionLocal
+if settings.DATABASE_REPLICA_URL:
+    replica_scheme, _, replica_rest = normalize_url(settings.DATABASE_REPLICA_URL).partition("://")
+    replica_url = f"{ASYNC_DRIVERS.get(replica_scheme, replica_scheme)}://{replica_rest}"
+    replica_engine = create_engine(replica_url, **engine_options(replica_url))
+    instrument(replica_engine)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+# Clients that recently sent a write keep reading from the primary until the
+# replica has caught up. Per process: enough with one worker per instance
+recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+def client_address(request: Request) -> str:
+    """Address of the client, as seen by the outermost trusted proxy."""
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops:
+        forwarded = [
+            entry.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for entry in header.split(",")
+            if entry.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else ""
+
+def client_key(request: Request) -> str:
+    # The bearer token identifies a signed-in user; anonymous clients by address
+    return request.headers.get("authorization") or client_address(request)
+
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if is_async:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(database_url, **engine_options(database_url))
+    instrument(async_engine.sync_engine)
+    AsyncSessionLocal = sessionmaker(
+        async_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+    )
+    AsyncReplicaSessionLocal = AsyncSessionLocal
+    if replica_engine is not None:
+        sync_replica_scheme = replica_url.partition("://")[0]
+        async_replica_url = f"{ASYNC_SCHEMES.get(sync_replica_scheme, sync_replica_scheme)}://{replica_rest}"
+        async_replica_engine = create_async_engine(async_replica_url, **engine_options(async_replica_url))
+        instrument(async_replica_engine.sync_engine)
+        AsyncReplicaSessionLocal = sessionmaker(
+            async_replica_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+        )
+
 Base = declarative_base()
 
-def get_db():
+def dialect_name(bind) -> str:
+    """Dialect of a Session, Connection or Engine."""
+    get_bind = getattr(bind, "get_bind", None)
+    return (get_bind() if get_bind else bind).dialect.name
+
+def get_db(request: Request = None):
+    # Writes pin the client to the primary: marked up front, and again once the
+    # session closes so the window runs from the end of the write
+    writing = request is not None and request.method not in SAFE_METHODS
+    if writing:
+        recent_writers.set(client_key(request), True)
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+        if writing:
+            recent_writers.set(client_key(request), True)
+
+def _use_replica(request: Request = None) -> bool:
+    """Whether a read-only request may go to the replica; counted per target."""
+    replica = replica_engine is not None and request is not None and recent_writers.get(client_key(request)) is None
+    metrics.read_sessions.inc("replica" if replica else "primary")
+    return replica
+
+def read_session_factory(request: Request = None):
+    """Replica sessions, unless there is no replica or the client wrote recently."""
+    return ReplicaSessionLocal if _use_replica(request) else SessionLocal
+
+def get_read_db(request: Request = None):
+    """``get_db`` for read-only routes."""
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def async_read_session_factory(request: Request = None):
+    """``read_session_factory`` for async sessions."""
+    return AsyncReplicaSessionLocal if _use_replica(request) else AsyncSessionLocal
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async mode requires an async driver in DATABASE_URL, e.g. sqlite+aiosqlite://")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db(request: Request = None):
+    """``get_read_db`` for async routes: replica or primary, on the event loop."""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async mode requires an async driver in DATABASE_URL, e.g. sqlite+aiosqlite://")
+    async with async_read_session_factory(request)() as db:
+        yield db
@@ -0,0 +1,65 @@
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models
+from .bus import bus
+from .cache import TTLCache
+from .config import settings
+
+# (student_id, subject_id) -> bool, including negative answers
+enrollment_cache = TTLCache(maxsize=settings.ENROLLMENT_CACHE_SIZE, ttl=settings.ENROLLMENT_CACHE_TTL_SECONDS)
+
+_enrollment = models.student_subjects
+
+
+def is_enrolled(db: Session, student_id: int, subject_id: int) -> bool:
+    """Primary-key lookup on student_subjects instead of loading the collection."""
+    key = (student_id, subject_id)
+    enrolled = enrollment_cache.get(key)
+    if enrolled is None:
+        enrolled = db.query(
+            exists().where(_enrollment.c.user_id == student_id, _enrollment.c.subject_id == subject_id)
+        ).scalar()
+        enrollment_cache.set(key, enrolled)
+    return enrolled
+
+
+async def is_enrolled_async(db: AsyncSession, student_id: int, subject_id: int) -> bool:
+    """``is_enrolled`` on an AsyncSession."""
+    key = (student_id, subject_id)
+    enrolled = enrollment_cache.get(key)
+    if enrolled is None:
+        enrolled = (await db.execute(select(
+            exists().where(_enrollment.c.user_id == student_id, _enrollment.c.subject_id == subject_id)
+        ))).scalar()
+        enrollment_cache.set(key, enrolled)
+    return enrolled
+
+
+def add_enrollments(db: Session, student_id: int, subject_ids):
+    """Insert enrollment rows; the caller commits and then calls ``remember``."""
+    db.execute(insert(_enrollment), [{"user_id": student_id, "subject_id": s} for s in subject_ids])
+
+
+def remove_enrollment(db: Session, student_id: int, subject_id: int):
+    db.execute(delete(_enrollment).where(
+        _enrollment.c.user_id == student_id, _enrollment.c.subject_id == subject_id
+    ))
+
+
+def remember(student_id: int, subject_ids, enrolled: bool):
+    """Record the committed state so the next check needs no query; other
+    workers drop their cached answers."""
+    subject_ids = list(subject_ids)
+    bus.publish("enrollment", [student_id, subject_ids])
+    for subject_id in subject_ids:
+        enrollment_cache.set((student_id, subject_id), enrolled)
+
+
+def _forget(payload):
+    student_id, subject_ids = payload
+    for subject_id in subject_ids:
+        enrollment_cache.pop((student_id, subject_id))
+
+
+bus.subscribe("enrollment", _forget, reset=enrollment_cache.clear)
@@ -0,0 +1,188 @@
+"""Server-sent event feeds of new solutions, evaluations and task changes.
+
+Write handlers call ``publish`` once committed. Events travel over the
+invalidation bus (app.bus), so with ``CACHE_BUS`` set they reach clients
+connected to any worker, and each worker fans them out to its subscribers.
+A subscriber is an ``asyncio.Queue`` drained by its response on the event
+loop; publishers run in worker threads and hand events over with
+``call_soon_threadsafe``, so an idle connection holds no thread and no
+database connection.
+
+Topics:
+
+- ``subject:{id}``: solutions of a subject, for its teacher
+- ``student:{id}``: a student's own solutions
+- ``tasks:{subject_id}``: task changes, for the teacher and enrolled students
+
+Events carry ids and changed fields only; clients fetch anything else they
+need (e.g. a solution's content) themselves. A client that falls
+``EVENTS_QUEUE_SIZE`` events behind gets a single ``resync`` event instead
+and should refetch.
+"""
+import asyncio
+import json
+import threading
+from typing import Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from . import metrics
+from .bus import bus
+from .config import settings
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 5000
+
+
+def _message(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+RESYNC = _message("resync", {})
+KEEPALIVE = ": keepalive\n\n"
+
+
+class Subscriber:
+    def __init__(self, topics: List[str], loop):
+        self.topics = topics
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, message: str):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+
+class Broker:
+    """Subscribers of this process by topic."""
+
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.connections = 0
+
+    def subscribe(self, topics: List[str]) -> Subscriber:
+        """Register a subscriber; call on the event loop that will drain it."""
+        subscriber = Subscriber(topics, asyncio.get_running_loop())
+        with self._lock:
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(subscriber)
+            self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            for topic in subscriber.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._topics[topic]
+            self.connections -= 1
+
+    def deliver(self, topics: Iterable[str], message: str):
+        """Queue ``message`` for every subscriber of any of ``topics``; thread-safe."""
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                targets.update(self._topics.get(topic, ()))
+        for subscriber in targets:
+            subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+
+    def resync_all(self):
+        with self._lock:
+            targets = set().union(*self._topics.values())
+        for subscriber in targets:
+            subscriber.loop.call_soon_threadsafe(subscriber.put, RESYNC)
+
+
+broker = Broker()
+metrics.registry.register(metrics.Gauge(
+    "sse_connections", "Open server-sent event streams", function=lambda: broker.connections
+))
+
+
+def publish(events: List[Tuple[List[str], str, dict]]):
+    """Send ``(topics, event type, data)`` events to subscribers in every worker."""
+    if events:
+        bus.publish_items("events", events)
+
+
+def _deliver(events):
+    for topics, event_type, data in events:
+        broker.deliver(topics, _message(event_type, data))
+
+
+bus.subscribe("events", _deliver, reset=broker.resync_all)
+
+
+def _time(value):
+    return value.isoformat() if value is not None else None
+
+
+def solution_created(subject_id: int, solution) -> tuple:
+    # The fields of a SolutionSummary, so listings add the row without fetching the body
+    return [f"subject:{subject_id}", f"student:{solution.student_id}"], "solution.created", {
+        "id": solution.id,
+        "task_id": solution.task_id,
+        "student_id": solution.student_id,
+        "content_size": len(solution.content.encode("utf-8")),
+        "points_earned": None,
+        "submitted_at": _time(solution.submitted_at),
+        "evaluated_at": None,
+    }
+
+
+def solution_evaluated(
+    subject_id: int, solution_id: int, task_id: int, student_id: int, points_earned: int, evaluated_at,
+    previous_points: Optional[int],
+) -> tuple:
+    # previous_points lets clients update task counters without refetching
+    return [f"subject:{subject_id}", f"student:{student_id}"], "solution.evaluated", {
+        "id": solution_id,
+        "task_id": task_id,
+        "student_id": student_id,
+        "points_earned": points_earned,
+        "previous_points": previous_points,
+        "evaluated_at": _time(evaluated_at),
+    }
+
+
+def task_changed(event_type: str, task) -> tuple:
+    return [f"tasks:{task.subject_id}"], event_type, {
+        "id": task.id,
+        "subject_id": task.subject_id,
+        "name": task.name,
+        "description": task.description,
+        "points": task.points,
+        "updated_at": _time(task.updated_at),
+    }
+
+
+async def _stream(topics: List[str]):
+    subscriber = broker.subscribe(topics)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                message = KEEPALIVE
+            yield message
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def event_stream(topics: List[str]) -> StreamingResponse:
+    """An SSE response for ``topics``; the caller has checked access."""
+    if broker.connections >= settings.EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        _stream(topics),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,117 @@
+"""Streaming CSV/NDJSON export of solutions.
+
+Rows are read through a server-side cursor (``yield_per``) in a session owned
+by the response generator and written out in fixed-size chunks, so memory
+stays flat regardless of the export size and the first bytes go out before
+the query has finished.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from . import content_store, models
+from .database import SessionLocal
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+FETCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def solutions_statement(*filters, include_content: bool = False):
+    """Solutions with their task and student, in (task, student, id) index order."""
+    Solution = models.Solution
+    columns = [
+        Solution.id.label("solution_id"),
+        Solution.task_id,
+        models.Task.name.label("task_name"),
+        Solution.student_id,
+        models.User.username.label("student_username"),
+        models.User.email.label("student_email"),
+        Solution.points_earned,
+        models.Task.points.label("max_points"),
+        Solution.submitted_at,
+        Solution.evaluated_at,
+    ]
+    if include_content:
+        # Replaced by the body itself while streaming
+        columns.append(Solution.content_hash.label("content"))
+    return select(*columns).join(
+        models.Task, models.Task.id == Solution.task_id
+    ).join(
+        models.User, models.User.id == Solution.student_id
+    ).where(*filters).order_by(models.Task.id, Solution.student_id, Solution.id)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _stream_rows(statement, content_index=None, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        result = db.execute(statement, execution_options={"yield_per": FETCH_SIZE})
+        for partition in result.partitions():
+            if content_index is None:
+                yield from partition
+                continue
+            # One content store lookup per fetched partition
+            bodies = content_store.load(db, [row[content_index] for row in partition])
+            for row in partition:
+                row = list(row)
+                row[content_index] = bodies.get(row[content_index])
+                yield row
+    finally:
+        db.close()
+
+
+def _encode(format: str, keys, rows):
+    buffer = io.StringIO()
+    if format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+        write = lambda row: writer.writerow([_csv_value(value) for value in row])
+    else:
+        write = lambda row: buffer.write(json.dumps(dict(zip(keys, row)), default=_json_default) + "\n")
+    # Header (or nothing, for NDJSON) goes out before the query runs
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        write(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        # Sync-flush every chunk so compressed bytes reach the client as they are produced
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(statement, filename: str, format: str = "csv", gzip: bool = False, session_factory=SessionLocal):
+    keys = [column.key for column in statement.selected_columns]
+    rows = _stream_rows(statement, keys.index("content") if "content" in keys else None, session_factory)
+    chunks = (chunk.encode() for chunk in _encode(format, keys, rows) if chunk)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    if gzip:
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
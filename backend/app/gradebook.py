@@ -0,0 +1,31 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models
+
+
+def attempt_scores(db: Session, attempt: str, *filters):
+    """Subquery of ``(student_id, task_id, score)`` with one row per attempted task.
+
+    ``best`` takes the highest graded attempt; ``latest`` takes the most
+    recent submission, whose score is NULL until it has been evaluated.
+    ``filters`` are applied to the joined solutions/tasks rows.
+    """
+    Solution = models.Solution
+    if attempt == "best":
+        return db.query(
+            Solution.student_id,
+            Solution.task_id,
+            func.max(Solution.points_earned).label("score"),
+        ).join(models.Task, models.Task.id == Solution.task_id).filter(
+            *filters
+        ).group_by(Solution.student_id, Solution.task_id).subquery()
+
+    # Solution ids grow with submitted_at, so the newest attempt has the largest id
+    latest_ids = db.query(func.max(Solution.id)).join(
+        models.Task, models.Task.id == Solution.task_id
+    ).filter(*filters).group_by(Solution.student_id, Solution.task_id)
+    return db.query(
+        Solution.student_id,
+        Solution.task_id,
+        Solution.points_earned.label("score"),
+    ).filter(Solution.id.in_(latest_ids)).subquery()
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .bus import bus
+from .cache import TTLCache
+from .config import settings
+from .pagination import PageParams, paginate, paginate_async
+from .serialization import as_dicts, dumps, schema_columns
+
+# Serialized list responses keyed by (scope, request params, etag)
+response_cache = TTLCache(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+# Bumped on every invalidation so an ETag changes even when a write lands in
+# the same second as the previous one (updated_at has 1s resolution on SQLite)
+_generations = {}
+_generations_lock = threading.Lock()
+# Bumped when invalidations may have been missed, changing every ETag
+_epoch = 0
+
+
+def invalidate(scope: str):
+    """Drop cached bodies for ``scope`` in every worker after a write; call once committed."""
+    bus.publish("response", scope)
+
+
+def _drop(scope: str):
+    with _generations_lock:
+        _generations[scope] = _generations.get(scope, 0) + 1
+    response_cache.discard_where(lambda entry: entry[0] == scope)
+
+
+def _drop_all():
+    global _epoch
+    with _generations_lock:
+        _epoch += 1
+    response_cache.clear()
+
+
+bus.subscribe("response", _drop, reset=_drop_all)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _cache_key(request: Request, scope: str, version):
+    """Response cache key and headers; the key ends with the ETag."""
+    with _generations_lock:
+        generation = (_epoch, _generations.get(scope, 0))
+    params = tuple(sorted(request.query_params.multi_items()))
+    etag = make_etag(scope, params, tuple(version), generation)
+    return (scope, params, etag), {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _store(key, rows, scratch: Response):
+    extra = {name: value for name, value in scratch.headers.items() if name.startswith("x-")}
+    entry = (key[0], dumps(rows), extra)
+    response_cache.set(key, entry)
+    return entry
+
+
+def _body_response(entry, headers) -> Response:
+    _, body, extra = entry
+    return Response(content=body, media_type="application/json", headers={**extra, **headers})
+
+
+def cached_response(request: Request, scope: str, version, load):
+    """Serve a list endpoint with ETag revalidation and a serialized-body LRU.
+
+    ``version`` is a cheap fingerprint of the underlying rows (for example
+    max(updated_at) and count) and ``load`` a callable taking a Response (for
+    pagination headers) and returning the response rows as dicts, already
+    shaped like the response model (see ``serialization.schema_columns``).
+    """
+    key, headers = _cache_key(request, scope, version)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    entry = response_cache.get(key)
+    if entry is None:
+        scratch = Response()
+        entry = _store(key, load(scratch), scratch)
+    return _body_response(entry, headers)
+
+
+async def cached_response_async(request: Request, scope: str, version, load):
+    """``cached_response`` with a coroutine function as ``load``."""
+    key, headers = _cache_key(request, scope, version)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    entry = response_cache.get(key)
+    if entry is None:
+        scratch = Response()
+        entry = _store(key, await load(scratch), scratch)
+    return _body_response(entry, headers)
+
+
+def task_list_response(db: Session, request: Request, subject_id: int, page: PageParams):
+    """Task list of a subject for teachers and students; access is checked by the caller."""
+    in_subject = models.Task.subject_id == subject_id
+    version = db.query(func.max(models.Task.updated_at), func.count(models.Task.id)).filter(in_subject).one()
+
+    def load(response: Response):
+        query = db.query(*schema_columns(models.Task, schemas.Task)).filter(in_subject)
+        return as_dicts(paginate(query, models.Task.id, page, response))
+
+    return cached_response(request, f"tasks:{subject_id}", version, load)
+
+
+async def task_list_response_async(db: AsyncSession, request: Request, subject_id: int, page: PageParams):
+    """``task_list_response`` on an AsyncSession."""
+    in_subject = models.Task.subject_id == subject_id
+    version = (await db.execute(
+        select(func.max(models.Task.updated_at), func.count(models.Task.id)).where(in_subject)
+    )).one()
+
+    async def load(response: Response):
+        statement = select(*schema_columns(models.Task, schemas.Task)).where(in_subject)
+        return as_dicts(await paginate_async(db, statement, models.Task.id, page, response))
+
+    return await cached_response_async(request, f"tasks:{subject_id}", version, load)
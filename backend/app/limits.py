@@ -0,0 +1,159 @@
+"""Admission control for expensive routes.
+
+Routes opt in with ``dependencies=[Depends(limits.limit("submit"))]``. Each
+route class has:
+
+- a token bucket per client (the signed-in user, or the client address):
+  ``<CLASS>_RATE_PER_MINUTE`` tokens refill per minute, up to ``<CLASS>_BURST``.
+  An empty bucket answers 429.
+- a cap on requests in flight in this process (``<CLASS>_MAX_CONCURRENT``).
+  A full cap answers 503.
+
+Both carry ``Retry-After``. Requests are refused straight away rather than
+queued, so one busy client cannot hold threads and connections that other
+clients' requests need.
+
+All state is in memory, per process: behind N workers or instances a client
+whose requests are spread across them gets up to N times the configured rate.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from . import auth, metrics
+from .config import settings
+from .database import client_address
+
+MAX_CLIENTS = 100_000
+
+
+class TokenBuckets:
+    """One token bucket per key; the least recently seen keys are evicted
+    (coming back with a full bucket) beyond ``maxsize``."""
+
+    def __init__(self, rate_per_minute: float, burst: int, maxsize: int = MAX_CLIENTS):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """Take a token for ``key``; returns 0, or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if 0 < self.limit <= self.in_flight:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class Policy:
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_concurrent: int):
+        self.name = name
+        self.buckets = TokenBuckets(rate_per_minute, burst)
+        self.concurrency = ConcurrencyLimit(max_concurrent)
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def stats(self):
+        return {
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "in_flight": self.concurrency.in_flight,
+            "max_concurrent": self.concurrency.limit,
+            "clients": len(self.buckets),
+        }
+
+
+def submit_max_concurrent() -> int:
+    # Batched submissions wait on the event loop, holding no thread or
+    # connection: leave room for a full batch on top of the checks in progress
+    limit = settings.SUBMIT_MAX_CONCURRENT
+    if settings.SUBMISSION_BATCHING and limit > 0:
+        limit += settings.SUBMISSION_BATCH_SIZE
+    return limit
+
+
+POLICIES = {
+    "auth": Policy("auth", settings.AUTH_RATE_PER_MINUTE, settings.AUTH_BURST, settings.AUTH_MAX_CONCURRENT),
+    "submit": Policy("submit", settings.SUBMIT_RATE_PER_MINUTE, settings.SUBMIT_BURST, submit_max_concurrent()),
+    "solutions": Policy(
+        "solutions", settings.SOLUTIONS_RATE_PER_MINUTE, settings.SOLUTIONS_BURST, settings.SOLUTIONS_MAX_CONCURRENT
+    ),
+}
+
+
+def client_key(request: Request) -> str:
+    """The user of a valid bearer token, otherwise the client address."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        subject = auth.token_subject(token)
+        if subject is not None:
+            return f"user:{subject}"
+    return f"ip:{client_address(request) or 'unknown'}"
+
+
+def limit(route_class: str):
+    """Dependency admitting a request of ``route_class`` or refusing it with 429/503."""
+    policy = POLICIES[route_class]
+
+    async def admit(request: Request):
+        if not settings.RATE_LIMITING:
+            yield
+            return
+        wait = policy.buckets.take(client_key(request))
+        if wait:
+            policy.rate_limited += 1
+            metrics.requests_refused.inc(route_class, "rate_limited")
+            raise HTTPException(
+                status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(wait))}
+            )
+        if not policy.concurrency.acquire():
+            policy.shed += 1
+            metrics.requests_refused.inc(route_class, "shed")
+            raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+        policy.admitted += 1
+        try:
+            yield
+        finally:
+            policy.concurrency.release()
+
+    return admit
+
+
+def stats():
+    return {name: policy.stats() for name, policy in POLICIES.items()}
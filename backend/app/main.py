@@ -1,15 +1,41 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from .config import settings
+from sqlalchemy import exc, text
+from .database import engine, async_engine
+from . import content_store, limits, metrics, migrations
+from .middleware import MetricsMiddleware, QueryStatsMiddleware
+from .http_cache import response_cache
+from .enrollment import enrollment_cache
+from .submissions import batcher
+from .bus import bus
 from .routers import auth, teachers, students, setup
+from .auth import token_cache_stats, shutdown_hash_executor
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module has no side effects; the database is first
+    # touched here, and only when AUTO_MIGRATE is on
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    if settings.AUTO_MIGRATE:
+        await to_thread.run_sync(lambda: migrations.upgrade(engine, log=lambda message: None))
+    bus.start()
+    yield
+    bus.stop()
+    batcher.stop()
+    shutdown_hash_executor()
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title="LMS API",
     description="Learning Management System API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for React frontend
@@ -25,7 +51,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time-Ms", "Server-Timing", "X-Next-Cursor", "ETag", "Retry-After"],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 # Include routers
@@ -34,6 +63,17 @@ app.include_router(teachers.router, prefix="/api/teacher", tags=["Teacher"])
 app.include_router(students.router, prefix="/api/student", tags=["Student"])
 app.include_router(setup.router, prefix="/api/setup", tags=["Setup"])
 
+@app.exception_handler(content_store.MissingContent)
+async def missing_content_handler(request: Request, exc: content_store.MissingContent):
+    # A body lost from the store (e.g. a deleted file) is gone, not a server error
+    return JSONResponse(status_code=410, content={"detail": "Solution content is no longer available"})
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    # No pooled connection within DB_POOL_TIMEOUT: overloaded, not broken
+    metrics.pool_timeouts.inc()
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
+
 @app.get("/")
 def read_root():
     return {
@@ -43,5 +83,42 @@ def read_root():
     }
 
 @app.get("/health")
+@app.get("/health/live")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    # Liveness: the process is up and serving; never touches the database
+    return {"status": "healthy"}
+
+@app.get("/health/ready")
+def readiness_check(response: Response):
+    # Readiness: the pool has room and the database answers
+    pool = engine.pool
+    if hasattr(pool, "checkedout") and pool.checkedout() >= settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW > 0:
+        response.status_code = 503
+        return {"status": "unavailable", "detail": "Database connection pool exhausted"}
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as exc:
+        response.status_code = 503
+        return {"status": "unavailable", "detail": f"Database unreachable: {type(exc).__name__}"}
+    return {"status": "ready"}
+
+def require_metrics_token(request: Request):
+    # Operational internals: only for scrapers holding METRICS_TOKEN, when set
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def metrics_endpoint():
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/stats/cache", dependencies=[Depends(require_metrics_token)])
+def cache_stats():
+    return {
+        "token_cache": token_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "enrollment_cache": enrollment_cache.stats(),
+        "submission_batches": batcher.stats(),
+        "invalidation_bus": bus.stats(),
+        "admission": limits.stats(),
+    }
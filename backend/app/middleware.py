@@ -0,0 +1,80 @@
+import time
+from . import metrics
+from .database import QueryStats, current_query_stats
+
+
+class QueryStatsMiddleware:
+    """Reports per-request DB statement count and time as response headers.
+
+    Adds ``X-DB-Queries``, ``X-DB-Time-Ms`` and a ``Server-Timing`` entry so
+    browser dev tools show the DB share of each request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                millis = stats.seconds * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{millis:.2f}".encode()))
+                headers.append((b"server-timing", f'db;dur={millis:.2f};desc="{stats.count} queries"'.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+
+
+def route_template(scope) -> str:
+    """Full path template of the matched route, e.g. ``/api/teacher/tasks/{task_id}``."""
+    # Since FastAPI includes routers lazily, the matched APIRoute only knows its
+    # own path; the effective route context carries the prefixed one
+    route = (scope.get("fastapi") or {}).get("effective_route_context") or scope.get("route")
+    return getattr(route, "path_format", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Records request counts, latency and in-flight requests per route.
+
+    Routes are labelled by their path template (``/api/teacher/tasks/{task_id}``)
+    so ids don't create a series each; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        metrics.http_in_progress.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_in_progress.dec()
+            path = route_template(scope)
+            method = scope["method"]
+            metrics.http_requests.inc(method, path, str(status))
+            metrics.http_latency.observe(time.perf_counter() - start, method, path)
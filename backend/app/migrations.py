@@ -0,0 +1,155 @@
+"""Versioned schema migrations.
+
+A fresh database is created from the models and stamped with the latest
+version. An existing database runs every migration newer than its recorded
+version, in order. Migrations must be idempotent: several workers may start
+at once and a fresh database already has the final schema.
+
+    python -m app.migrations          # upgrade to the latest version
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, bindparam, column, inspect, select, table, text, update
+from .database import Base, engine
+from . import content_store, models, search
+
+version_metadata = MetaData()
+schema_version = Table("schema_version", version_metadata, Column("version", Integer, nullable=False))
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def create_indexes(connection, table):
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+@migration(1, "Composite and partial indexes for hot query predicates")
+def add_hot_path_indexes(connection):
+    hot_tables = (models.student_subjects, models.Subject.__table__, models.Task.__table__, models.Solution.__table__)
+    for hot_table in hot_tables:
+        create_indexes(connection, hot_table)
+
+
+@migration(2, "Incrementally maintained task statistics")
+def add_task_stats(connection):
+    from .task_stats import rebuild
+
+    models.TaskStats.__table__.create(connection, checkfirst=True)
+    rebuild(connection)
+
+
+@migration(3, "Full-text search indexes")
+def add_search_indexes(connection):
+    search.create(connection)
+    # Solutions are indexed from the content store by migration 4
+    search.rebuild(connection, [models.Subject, models.Task])
+
+
+@migration(4, "Move solution bodies into the content store")
+def move_solution_content(connection):
+    models.SolutionBlob.__table__.create(connection, checkfirst=True)
+    columns = {c["name"] for c in inspect(connection).get_columns("solutions")}
+    if "content" in columns:
+        if "content_hash" not in columns:
+            connection.execute(text("ALTER TABLE solutions ADD COLUMN content_hash VARCHAR(64)"))
+            connection.execute(text("ALTER TABLE solutions ADD COLUMN content_size INTEGER"))
+
+        # Old table layout, addressed without the current model
+        old = table("solutions", column("id"), column("content"), column("content_hash"), column("content_size"))
+        last_id = 0
+        while True:
+            batch = connection.execute(
+                select(old.c.id, old.c.content).where(old.c.id > last_id).order_by(old.c.id).limit(1000)
+            ).all()
+            if not batch:
+                break
+            refs = content_store.save(connection, [content for _, content in batch])
+            connection.execute(
+                update(old).where(old.c.id == bindparam("row_id")).values(
+                    content_hash=bindparam("row_hash"), content_size=bindparam("row_size")
+                ),
+                [{"row_id": row_id, "row_hash": h, "row_size": size} for (row_id, _), (h, size) in zip(batch, refs)],
+            )
+            last_id = batch[-1][0]
+
+        if connection.dialect.name == "sqlite":
+            # SQLite cannot add NOT NULL to existing columns: rebuild the table
+            for index in inspect(connection).get_indexes("solutions"):
+                connection.execute(text(f"DROP INDEX {index['name']}"))
+            connection.execute(text("ALTER TABLE solutions RENAME TO solutions_old"))
+            models.Solution.__table__.create(connection)
+            names = ", ".join(c.name for c in models.Solution.__table__.columns)
+            connection.execute(text(f"INSERT INTO solutions ({names}) SELECT {names} FROM solutions_old"))
+            connection.execute(text("DROP TABLE solutions_old"))
+        else:
+            connection.execute(text(
+                "ALTER TABLE solutions DROP COLUMN content, "
+                "ALTER COLUMN content_hash SET NOT NULL, ALTER COLUMN content_size SET NOT NULL"
+            ))
+
+    search.create(connection)
+    search.rebuild(connection, [models.Solution])
+
+
+@migration(5, "Cache invalidation events shared between workers")
+def add_cache_events(connection):
+    models.CacheEvent.__table__.create(connection, checkfirst=True)
+
+
+@migration(6, "Cache event ids are never reused on SQLite")
+def cache_events_autoincrement(connection):
+    if connection.dialect.name != "sqlite":
+        return
+    schema = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'cache_events'")).scalar()
+    if "AUTOINCREMENT" in schema.upper():
+        return
+    # AUTOINCREMENT needs a new table; copying the rows seeds its sequence
+    connection.execute(text("ALTER TABLE cache_events RENAME TO cache_events_old"))
+    models.CacheEvent.__table__.create(connection)
+    connection.execute(text("INSERT INTO cache_events (id, message) SELECT id, message FROM cache_events_old"))
+    connection.execute(text("DROP TABLE cache_events_old"))
+
+
+def get_version(connection):
+    return connection.execute(select(schema_version.c.version)).scalar()
+
+def set_version(connection, version: int):
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=version))
+
+def upgrade(bind=engine, log=print):
+    """Bring the schema at ``bind`` up to the latest migration."""
+    with bind.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Serialise concurrent upgrades from several workers/instances
+            connection.execute(text("SELECT pg_advisory_xact_lock(7331001)"))
+
+        existing_tables = set(inspect(connection).get_table_names())
+        schema_version.create(connection, checkfirst=True)
+        version = get_version(connection)
+        if version is None:
+            if models.User.__tablename__ not in existing_tables:
+                Base.metadata.create_all(bind=connection)
+                set_version(connection, latest_version())
+                log(f"Created schema at version {latest_version()}")
+                return
+            # Tables predate versioning: start from the original schema
+            version = 0
+
+        for number, description, fn in MIGRATIONS:
+            if number > version:
+                log(f"Applying migration {number}: {description}")
+                fn(connection)
+                set_version(connection, number)
+
+if __name__ == "__main__":
+    upgrade()
+    print("Schema is up to date")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, LargeBinary, Table, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -8,7 +8,9 @@ student_subjects = Table(
     'student_subjects',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('subject_id', Integer, ForeignKey('subjects.id'), primary_key=True)
+    Column('subject_id', Integer, ForeignKey('subjects.id'), primary_key=True),
+    # The primary key covers lookups by student; rosters filter by subject
+    Index('ix_student_subjects_subject', 'subject_id', 'user_id')
 )
 
 class User(Base):
@@ -45,6 +47,16 @@ class Subject(Base):
     students = relationship("User", secondary=student_subjects, back_populates="enrolled_subjects")
     tasks = relationship("Task", back_populates="subject")
 
+    __table_args__ = (
+        Index('ix_subjects_teacher_deleted', 'teacher_id', 'deleted_at'),
+        # Catalog listing/pagination over subjects that are not soft-deleted
+        Index(
+            'ix_subjects_active', 'id',
+            sqlite_where=deleted_at.is_(None),
+            postgresql_where=deleted_at.is_(None),
+        ),
+    )
+
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -61,12 +73,18 @@ class Task(Base):
     subject = relationship("Subject", back_populates="tasks")
     solutions = relationship("Solution", back_populates="task")
 
+    __table_args__ = (
+        Index('ix_tasks_subject', 'subject_id'),
+    )
+
 
 class Solution(Base):
     __tablename__ = "solutions"
     
     id = Column(Integer, primary_key=True, index=True)
-    content = Column(Text, nullable=False)
+    # Body lives in app.content_store under its SHA-256; size is in UTF-8 bytes
+    content_hash = Column(String(64), nullable=False)
+    content_size = Column(Integer, nullable=False)
     task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
     student_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     points_earned = Column(Integer, nullable=True)
@@ -75,4 +93,54 @@ class Solution(Base):
     
     # Relationships
     task = relationship("Task", back_populates="solutions")
-    student = relationship("User", back_populates="solutions")
\ No newline at end of file
+    student = relationship("User", back_populates="solutions")
+
+    # Not a column: filled in by content_store.attach() when the body is needed
+    content = None
+
+    __table_args__ = (
+        Index('ix_solutions_task_student', 'task_id', 'student_id'),
+        Index('ix_solutions_student_task', 'student_id', 'task_id'),
+        # Only ungraded solutions, i.e. the teacher's grading queue
+        Index(
+            'ix_solutions_task_ungraded', 'task_id',
+            sqlite_where=points_earned.is_(None),
+            postgresql_where=points_earned.is_(None),
+        ),
+    )
+
+
+class TaskStats(Base):
+    """Per-task solution counters kept up to date by the write paths.
+
+    Maintained by app.task_stats in the same transaction as the solution
+    insert/evaluation; ``python -m app.task_stats`` rebuilds it from scratch.
+    """
+    __tablename__ = "task_stats"
+    
+    task_id = Column(Integer, ForeignKey('tasks.id'), primary_key=True)
+    total_solutions = Column(Integer, nullable=False, default=0)
+    evaluated_solutions = Column(Integer, nullable=False, default=0)
+    points_sum = Column(Integer, nullable=False, default=0)
+
+
+class SolutionBlob(Base):
+    """Compressed solution bodies keyed by SHA-256 (``CONTENT_STORE=db``)."""
+    __tablename__ = "solution_blobs"
+    
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+
+class CacheEvent(Base):
+    """Cache invalidations broadcast between workers (``CACHE_BUS=db``).
+
+    Each worker polls for ids above the last one it saw; app.bus keeps only
+    the most recent rows.
+    """
+    __tablename__ = "cache_events"
+    # Never reuse ids on SQLite, even after the newest rows were deleted
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    message = Column(Text, nullable=False)
@@ -0,0 +1,50 @@
+from typing import Optional
+from fastapi import Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_PAGE_SIZE = 500
+
+
+class PageParams:
+    """Keyset pagination query parameters.
+
+    ``cursor`` is the last ``id`` of the previous page; the next cursor is
+    returned in the ``X-Next-Cursor`` header while more rows remain. Without
+    ``limit`` the full list is returned, as before.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[int] = Query(None, ge=0),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def keyset(query, key_column, page: PageParams):
+    """``key_column > cursor ORDER BY key_column LIMIT n + 1`` on a Query or select()."""
+    if page.cursor is not None:
+        query = query.filter(key_column > page.cursor)
+    query = query.order_by(key_column)
+    # One extra row tells us whether another page exists without a COUNT
+    return query if page.limit is None else query.limit(page.limit + 1)
+
+
+def trim(rows, key_column, page: PageParams, response: Response):
+    """Drop the look-ahead row of a ``keyset`` page, setting ``X-Next-Cursor``."""
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers["X-Next-Cursor"] = str(getattr(rows[-1], key_column.key))
+    return rows
+
+
+def paginate(query, key_column, page: PageParams, response: Response):
+    """Apply ``key_column > cursor ORDER BY key_column LIMIT n`` to ``query``."""
+    return trim(keyset(query, key_column, page).all(), key_column, page, response)
+
+
+async def paginate_async(db: AsyncSession, statement, key_column, page: PageParams, response: Response):
+    """``paginate`` for a ``select()`` run on an AsyncSession."""
+    rows = (await db.execute(keyset(statement, key_column, page))).all()
+    return trim(rows, key_column, page, response)
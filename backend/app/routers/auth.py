@@ -2,13 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from .. import models, schemas, auth
+from .. import models, schemas, auth, limits
 from ..database import get_db
 from ..config import settings
 
 router = APIRouter()
 
-@router.post("/register", response_model=schemas.User)
+@router.post("/register", response_model=schemas.User, dependencies=[Depends(limits.limit("auth"))])
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
@@ -19,6 +19,9 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     if db_user:
         raise HTTPException(status_code=400, detail="Username already taken")
     
+    # End the read transaction so the connection goes back to the pool while bcrypt runs
+    db.commit()
+    
     # Create new user (always student, teachers are seeded)
     hashed_password = auth.get_password_hash(user.password)
     new_user = models.User(
@@ -32,22 +35,40 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     return new_user
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(limits.limit("auth"))])
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    user = db.query(
+        models.User.id, models.User.email, models.User.hashed_password
+    ).filter(models.User.email == form_data.username).first()
+    # Release the connection before the (slow) bcrypt check
+    db.commit()
+    
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = auth.verify_and_update_password(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored hash used an old bcrypt cost; upgrade it transparently
+    if new_hash:
+        db.query(models.User).filter(models.User.id == user.id).update({"hashed_password": new_hash})
+        db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+# Short-lived token for ?token= on the event streams, which cannot send headers
+@router.post("/stream-token", response_model=schemas.StreamToken)
+def get_stream_token(current_user: models.User = Depends(auth.get_current_user)):
+    return {"token": auth.create_stream_token(current_user.email), "expires_in": settings.STREAM_TOKEN_EXPIRE_SECONDS}
+
 @router.get("/me", response_model=schemas.User)
 def get_me(current_user: models.User = Depends(auth.get_current_user)):
     return current_user
\ No newline at end of file
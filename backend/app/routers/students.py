@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Union
 from .. import models, schemas, auth
-from ..database import get_db
+from .. import content_store, enrollment, events, limits, search, submissions
+from ..config import settings
+from ..gradebook import attempt_scores
+from ..http_cache import cached_response, cached_response_async, task_list_response, task_list_response_async
+from ..database import get_async_read_db, get_db, get_read_db, is_async
+from ..pagination import PageParams, paginate, paginate_async
+from ..serialization import as_dicts, json_response, schema_columns
 
 router = APIRouter()
 
@@ -11,19 +20,56 @@ def get_current_student(current_user: models.User = Depends(auth.get_current_use
         raise HTTPException(status_code=403, detail="Only students can access this")
     return current_user
 
+async def get_current_student_async(current_user: models.User = Depends(auth.get_current_user_async)):
+    if current_user.is_teacher:
+        raise HTTPException(status_code=403, detail="Only students can access this")
+    return current_user
+
+# Hot read paths have an async twin, registered instead of the sync one in
+# async mode (an async driver in DATABASE_URL) so they run on the event loop
+
 # Get all available subjects
-@router.get("/subjects", response_model=List[schemas.Subject])
-def get_all_subjects(db: Session = Depends(get_db)):
-    subjects = db.query(models.Subject).filter(models.Subject.deleted_at == None).all()
-    return subjects
+def get_all_subjects(request: Request, page: PageParams = Depends(), db: Session = Depends(get_read_db)):
+    active = models.Subject.deleted_at == None
+    version = db.query(func.max(models.Subject.updated_at), func.count(models.Subject.id)).filter(active).one()
+    
+    def load(response: Response):
+        query = db.query(*schema_columns(models.Subject, schemas.Subject)).filter(active)
+        return as_dicts(paginate(query, models.Subject.id, page, response))
+    
+    return cached_response(request, "subjects", version, load)
+
+async def get_all_subjects_async(request: Request, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    active = models.Subject.deleted_at == None
+    version = (await db.execute(
+        select(func.max(models.Subject.updated_at), func.count(models.Subject.id)).where(active)
+    )).one()
+    
+    async def load(response: Response):
+        statement = select(*schema_columns(models.Subject, schemas.Subject)).where(active)
+        return as_dicts(await paginate_async(db, statement, models.Subject.id, page, response))
+    
+    return await cached_response_async(request, "subjects", version, load)
+
+router.get("/subjects", response_model=List[schemas.Subject])(
+    get_all_subjects_async if is_async else get_all_subjects
+)
+
+# Full-text search over the catalog, best matches first
+@router.get("/subjects/search", response_model=List[schemas.Subject])
+def search_subjects(response: Response, params: search.SearchParams = Depends(), db: Session = Depends(get_read_db)):
+    query = search.matching(db, models.Subject, params.q, models.Subject.deleted_at == None)
+    return search.paginate_ranked(query, params, response)
 
 # Get subjects enrolled by the student
 @router.get("/my-subjects", response_model=List[schemas.Subject])
 def get_my_subjects(
     current_student: models.User = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    return current_student.enrolled_subjects
+    return db.query(models.Subject).join(
+        models.student_subjects, models.student_subjects.c.subject_id == models.Subject.id
+    ).filter(models.student_subjects.c.user_id == current_student.id).all()
 
 # Enroll in a subject
 @router.post("/subjects/{subject_id}/enroll", status_code=status.HTTP_200_OK)
@@ -32,7 +78,7 @@ def enroll_in_subject(
     current_student: models.User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    subject = db.query(models.Subject).filter(
+    subject = db.query(models.Subject.id).filter(
         models.Subject.id == subject_id,
         models.Subject.deleted_at == None
     ).first()
@@ -40,13 +86,48 @@ def enroll_in_subject(
         raise HTTPException(status_code=404, detail="Subject not found")
     
     # Check if already enrolled
-    if subject in current_student.enrolled_subjects:
+    if enrollment.is_enrolled(db, current_student.id, subject_id):
         raise HTTPException(status_code=400, detail="Already enrolled in this subject")
     
-    current_student.enrolled_subjects.append(subject)
+    enrollment.add_enrollments(db, current_student.id, [subject_id])
     db.commit()
+    enrollment.remember(current_student.id, [subject_id], True)
     return {"message": "Successfully enrolled in subject"}
 
+# Enroll in several subjects in one transaction
+@router.post("/subjects/enroll", response_model=List[schemas.BulkEnrollResult])
+def bulk_enroll(
+    request: schemas.BulkEnroll,
+    current_student: models.User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+):
+    subject_ids = list(dict.fromkeys(request.subject_ids))
+    
+    # Which subjects exist and which of them the student already has, in one query
+    enrolled = models.student_subjects
+    rows = db.query(models.Subject.id, enrolled.c.user_id).outerjoin(
+        enrolled,
+        and_(enrolled.c.subject_id == models.Subject.id, enrolled.c.user_id == current_student.id)
+    ).filter(
+        models.Subject.id.in_(subject_ids),
+        models.Subject.deleted_at == None
+    ).all()
+    found = {subject_id: user_id is not None for subject_id, user_id in rows}
+    
+    new_ids = [subject_id for subject_id in subject_ids if found.get(subject_id) is False]
+    if new_ids:
+        enrollment.add_enrollments(db, current_student.id, new_ids)
+        db.commit()
+    enrollment.remember(current_student.id, [i for i in subject_ids if i in found], True)
+    
+    return [
+        {
+            "subject_id": subject_id,
+            "status": "not_found" if subject_id not in found else "already_enrolled" if found[subject_id] else "enrolled",
+        }
+        for subject_id in subject_ids
+    ]
+
 # Leave a subject
 @router.delete("/subjects/{subject_id}/leave", status_code=status.HTTP_200_OK)
 def leave_subject(
@@ -54,27 +135,29 @@ def leave_subject(
     current_student: models.User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
+    subject = db.query(models.Subject.id).filter(models.Subject.id == subject_id).first()
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    if subject not in current_student.enrolled_subjects:
+    if not enrollment.is_enrolled(db, current_student.id, subject_id):
         raise HTTPException(status_code=400, detail="Not enrolled in this subject")
     
-    current_student.enrolled_subjects.remove(subject)
+    enrollment.remove_enrollment(db, current_student.id, subject_id)
     db.commit()
+    enrollment.remember(current_student.id, [subject_id], False)
     return {"message": "Successfully left subject"}
 
 
 
 # Get tasks for a subject
-@router.get("/subjects/{subject_id}/tasks", response_model=List[schemas.Task])
 def get_subject_tasks(
     subject_id: int,
+    request: Request,
+    page: PageParams = Depends(),
     current_student: models.User = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    subject = db.query(models.Subject).filter(
+    subject = db.query(models.Subject.id).filter(
         models.Subject.id == subject_id,
         models.Subject.deleted_at == None
     ).first()
@@ -82,48 +165,186 @@ def get_subject_tasks(
         raise HTTPException(status_code=404, detail="Subject not found")
     
     # Check if student is enrolled
-    if subject not in current_student.enrolled_subjects:
+    if not enrollment.is_enrolled(db, current_student.id, subject_id):
+        raise HTTPException(status_code=403, detail="You must be enrolled in this subject")
+    
+    return task_list_response(db, request, subject_id, page)
+
+async def get_subject_tasks_async(
+    subject_id: int,
+    request: Request,
+    page: PageParams = Depends(),
+    current_student: models.User = Depends(get_current_student_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    subject = (await db.execute(select(models.Subject.id).where(
+        models.Subject.id == subject_id,
+        models.Subject.deleted_at == None
+    ))).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    if not await enrollment.is_enrolled_async(db, current_student.id, subject_id):
         raise HTTPException(status_code=403, detail="You must be enrolled in this subject")
     
-    tasks = db.query(models.Task).filter(models.Task.subject_id == subject_id).all()
-    return tasks
+    return await task_list_response_async(db, request, subject_id, page)
+
+router.get("/subjects/{subject_id}/tasks", response_model=List[schemas.Task])(
+    get_subject_tasks_async if is_async else get_subject_tasks
+)
 
 # Submit a solution for a task
-@router.post("/tasks/{task_id}/submit", response_model=schemas.Solution, status_code=status.HTTP_201_CREATED)
+def _submission_row(db: Session, task_id: int, student_id: int, content: str):
+    subject_id = db.query(models.Task.subject_id).filter(models.Task.id == task_id).scalar()
+    if subject_id is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Check if student is enrolled in the subject
+    if not enrollment.is_enrolled(db, student_id, subject_id):
+        raise HTTPException(status_code=403, detail="You must be enrolled in this subject")
+    
+    return subject_id, {"content": content, "task_id": task_id, "student_id": student_id}
+
 def submit_solution(
     task_id: int,
     solution: schemas.SolutionCreate,
     current_student: models.User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check if student is enrolled in the subject
-    subject = db.query(models.Subject).filter(models.Subject.id == task.subject_id).first()
-    if subject not in current_student.enrolled_subjects:
-        raise HTTPException(status_code=403, detail="You must be enrolled in this subject")
-    
-    new_solution = models.Solution(
-        content=solution.content,
-        task_id=task_id,
-        student_id=current_student.id
-    )
-    db.add(new_solution)
+    subject_id, row = _submission_row(db, task_id, current_student.id, solution.content)
+    new_solution = submissions.insert_solutions(db, [row])[0]
     db.commit()
-    db.refresh(new_solution)
+    events.publish([events.solution_created(subject_id, new_solution)])
     return new_solution
 
-# Get my solutions for a task
-@router.get("/tasks/{task_id}/my-solutions", response_model=List[schemas.Solution])
-def get_my_solutions(
+# With batching the wait for the group commit happens on the event loop, so
+# waiters hold neither a threadpool thread nor a connection
+async def submit_solution_batched(
     task_id: int,
+    solution: schemas.SolutionCreate,
     current_student: models.User = Depends(get_current_student),
     db: Session = Depends(get_db)
 ):
-    solutions = db.query(models.Solution).filter(
-        models.Solution.task_id == task_id,
+    subject_id, row = await run_in_threadpool(_submission_row, db, task_id, current_student.id, solution.content)
+    await run_in_threadpool(db.close)
+    try:
+        new_solution = await submissions.batcher.submit(row, timeout=settings.SUBMISSION_BATCH_TIMEOUT_SECONDS)
+    except submissions.SubmissionTimeout:
+        # The row was withdrawn unwritten, so a retry cannot duplicate it
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "5"})
+    await run_in_threadpool(events.publish, [events.solution_created(subject_id, new_solution)])
+    return new_solution
+
+router.post(
+    "/tasks/{task_id}/submit", response_model=schemas.Solution, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limits.limit("submit"))],
+)(submit_solution_batched if settings.SUBMISSION_BATCHING else submit_solution)
+
+# Get my solutions for a task; bodies only with summary=false, otherwise
+# they are fetched one at a time from /solutions/{solution_id}
+def _my_solutions_statement(task_id: int, student_id: int, summary: bool):
+    Solution = models.Solution
+    if summary:
+        columns = schema_columns(Solution, schemas.SolutionSummary)
+    else:
+        columns = schema_columns(Solution, schemas.Solution, content=Solution.content_hash)
+    return select(*columns).where(Solution.task_id == task_id, Solution.student_id == student_id)
+
+def get_my_solutions(
+    task_id: int,
+    summary: bool = Query(True),
+    current_student: models.User = Depends(get_current_student),
+    db: Session = Depends(get_read_db)
+):
+    rows = as_dicts(db.execute(_my_solutions_statement(task_id, current_student.id, summary)))
+    if not summary:
+        content_store.attach_rows(db, rows)
+    return json_response(rows)
+
+async def get_my_solutions_async(
+    task_id: int,
+    summary: bool = Query(True),
+    current_student: models.User = Depends(get_current_student_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    rows = as_dicts(await db.execute(_my_solutions_statement(task_id, current_student.id, summary)))
+    if not summary:
+        # The content store's reads are shared with the sync path
+        await db.run_sync(content_store.attach_rows, rows)
+    return json_response(rows)
+
+router.get("/tasks/{task_id}/my-solutions", response_model=List[Union[schemas.Solution, schemas.SolutionSummary]])(
+    get_my_solutions_async if is_async else get_my_solutions
+)
+
+# Get one of my solutions with its content
+@router.get("/solutions/{solution_id}", response_model=schemas.Solution)
+def get_my_solution(
+    solution_id: int,
+    current_student: models.User = Depends(get_current_student),
+    db: Session = Depends(get_read_db)
+):
+    solution = db.query(models.Solution).filter(
+        models.Solution.id == solution_id,
         models.Solution.student_id == current_student.id
-    ).all()
-    return solutions
\ No newline at end of file
+    ).first()
+    if not solution:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    return content_store.attach(db, [solution])[0]
+
+# Points earned per enrolled subject
+@router.get("/gradebook", response_model=List[schemas.SubjectGrade])
+def get_my_grades(
+    attempt: schemas.GradebookAttempt = Query("best"),
+    current_student: models.User = Depends(get_current_student),
+    db: Session = Depends(get_read_db)
+):
+    scores = attempt_scores(db, attempt, models.Solution.student_id == current_student.id)
+    rows = db.query(
+        models.Subject.id,
+        models.Subject.name,
+        models.Subject.code,
+        func.count(models.Task.id),
+        func.count(scores.c.score),
+        func.coalesce(func.sum(scores.c.score), 0),
+        func.coalesce(func.sum(models.Task.points), 0),
+    ).join(
+        models.student_subjects, models.student_subjects.c.subject_id == models.Subject.id
+    ).outerjoin(
+        models.Task, models.Task.subject_id == models.Subject.id
+    ).outerjoin(
+        scores, scores.c.task_id == models.Task.id
+    ).filter(
+        models.student_subjects.c.user_id == current_student.id,
+        models.Subject.deleted_at == None
+    ).group_by(
+        models.Subject.id, models.Subject.name, models.Subject.code
+    ).order_by(models.Subject.name).all()
+    
+    return [
+        {
+            "subject_id": subject_id,
+            "name": name,
+            "code": code,
+            "task_count": task_count,
+            "graded_tasks": graded_tasks,
+            "points_earned": earned,
+            "points_possible": possible,
+        }
+        for subject_id, name, code, task_count, graded_tasks, earned, possible in rows
+    ]
+
+# Live feed of the student's own solutions and of task changes in enrolled subjects
+@router.get("/events")
+def my_events(
+    current_user: models.User = Depends(auth.get_stream_user),
+    db: Session = Depends(get_read_db)
+):
+    if current_user.is_teacher:
+        raise HTTPException(status_code=403, detail="Only students can access this")
+    subject_ids = [row.subject_id for row in db.query(models.student_subjects.c.subject_id).filter(
+        models.student_subjects.c.user_id == current_user.id
+    )]
+    # The stream needs no database; don't hold a connection for its lifetime
+    db.close()
+    return events.event_stream([f"student:{current_user.id}", *(f"tasks:{subject_id}" for subject_id in subject_ids)])
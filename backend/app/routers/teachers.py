@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, auth
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Union
+from .. import models, schemas, auth, content_store, events, limits, search, task_stats
+from ..export import export_response, solutions_statement
+from ..gradebook import attempt_scores
+from ..http_cache import invalidate, task_list_response, task_list_response_async
+from ..database import get_async_read_db, get_db, get_read_db, is_async, read_session_factory
+from ..pagination import PageParams, paginate
+from ..serialization import as_dicts, json_response, schema_columns
 
 router = APIRouter()
 
@@ -11,11 +18,31 @@ def get_current_teacher(current_user: models.User = Depends(auth.get_current_use
         raise HTTPException(status_code=403, detail="Only teachers can access this")
     return current_user
 
+async def get_current_teacher_async(current_user: models.User = Depends(auth.get_current_user_async)):
+    if not current_user.is_teacher:
+        raise HTTPException(status_code=403, detail="Only teachers can access this")
+    return current_user
+
+def get_owned_task(db: Session, task_id: int, teacher_id: int, *columns):
+    """Load a task and its subject's owner in one query.
+
+    Extra ``columns`` are selected alongside; the task is returned alone or
+    as a row of ``(task, *columns)``.
+    """
+    row = db.query(models.Task, models.Subject.teacher_id, *columns).join(
+        models.Subject, models.Subject.id == models.Task.subject_id
+    ).filter(models.Task.id == task_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if row[1] != teacher_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return (row[0], *row[2:]) if columns else row[0]
+
 # Get all subjects for the logged-in teacher
 @router.get("/subjects", response_model=List[schemas.Subject])
 def get_my_subjects(
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     subjects = db.query(models.Subject).filter(
         models.Subject.teacher_id == current_teacher.id,
@@ -40,8 +67,11 @@ def create_subject(
         teacher_id=current_teacher.id
     )
     db.add(new_subject)
+    db.flush()
+    search.index_object(db, new_subject)
     db.commit()
     db.refresh(new_subject)
+    invalidate("subjects")
     return new_subject
 
 
@@ -51,9 +81,9 @@ def create_subject(
 def get_subject(
     subject_id: int,
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    subject = db.query(models.Subject).filter(
+    subject = db.query(models.Subject).options(selectinload(models.Subject.students)).filter(
         models.Subject.id == subject_id,
         models.Subject.teacher_id == current_teacher.id,
         models.Subject.deleted_at == None
@@ -81,8 +111,10 @@ def update_subject(
     for key, value in subject_update.dict().items():
         setattr(subject, key, value)
     
+    search.index_object(db, subject)
     db.commit()
     db.refresh(subject)
+    invalidate("subjects")
     return subject
 
 # Delete a subject (soft delete)
@@ -103,6 +135,8 @@ def delete_subject(
     
     subject.deleted_at = datetime.utcnow()
     db.commit()
+    invalidate("subjects")
+    invalidate(f"tasks:{subject_id}")
     return None
 
 
@@ -126,16 +160,21 @@ def create_task(
     
     new_task = models.Task(**task.dict())
     db.add(new_task)
+    db.flush()
+    search.index_object(db, new_task)
     db.commit()
     db.refresh(new_task)
+    invalidate(f"tasks:{new_task.subject_id}")
+    events.publish([events.task_changed("task.created", new_task)])
     return new_task
 
-# Get all tasks for a subject
-@router.get("/subjects/{subject_id}/tasks", response_model=List[schemas.Task])
+# Get all tasks for a subject (async twin registered in async mode)
 def get_tasks(
     subject_id: int,
+    request: Request,
+    page: PageParams = Depends(),
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     # Verify subject belongs to teacher
     subject = db.query(models.Subject).filter(
@@ -146,8 +185,28 @@ def get_tasks(
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    tasks = db.query(models.Task).filter(models.Task.subject_id == subject_id).all()
-    return tasks
+    return task_list_response(db, request, subject_id, page)
+
+async def get_tasks_async(
+    subject_id: int,
+    request: Request,
+    page: PageParams = Depends(),
+    current_teacher: models.User = Depends(get_current_teacher_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    subject = (await db.execute(select(models.Subject.id).where(
+        models.Subject.id == subject_id,
+        models.Subject.teacher_id == current_teacher.id,
+        models.Subject.deleted_at == None
+    ))).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    return await task_list_response_async(db, request, subject_id, page)
+
+router.get("/subjects/{subject_id}/tasks", response_model=List[schemas.Task])(
+    get_tasks_async if is_async else get_tasks
+)
 
 # Update a task
 @router.put("/tasks/{task_id}", response_model=schemas.Task)
@@ -157,48 +216,65 @@ def update_task(
     current_teacher: models.User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Verify subject belongs to teacher
-    subject = db.query(models.Subject).filter(
-        models.Subject.id == task.subject_id,
-        models.Subject.teacher_id == current_teacher.id
-    ).first()
-    if not subject:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    task = get_owned_task(db, task_id, current_teacher.id)
     
     for key, value in task_update.dict().items():
         setattr(task, key, value)
     
+    search.index_object(db, task)
     db.commit()
     db.refresh(task)
+    invalidate(f"tasks:{task.subject_id}")
+    events.publish([events.task_changed("task.updated", task)])
     return task
 
 
 
-# Get all solutions for a task
-@router.get("/tasks/{task_id}/solutions", response_model=List[schemas.Solution])
+# Get all solutions for a task; bodies only with summary=false, otherwise
+# they are fetched one at a time from /solutions/{solution_id}
+@router.get(
+    "/tasks/{task_id}/solutions", response_model=List[Union[schemas.Solution, schemas.SolutionSummary]],
+    dependencies=[Depends(limits.limit("solutions"))],
+)
 def get_task_solutions(
     task_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    summary: bool = Query(True),
     current_teacher: models.User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    get_owned_task(db, task_id, current_teacher.id)
     
-    # Verify subject belongs to teacher
-    subject = db.query(models.Subject).filter(
-        models.Subject.id == task.subject_id,
-        models.Subject.teacher_id == current_teacher.id
-    ).first()
-    if not subject:
+    # Plain column rows serialized once; content is swapped in from the store
+    Solution = models.Solution
+    if summary:
+        columns = schema_columns(Solution, schemas.SolutionSummary)
+    else:
+        columns = schema_columns(Solution, schemas.Solution, content=Solution.content_hash)
+    query = db.query(*columns).filter(Solution.task_id == task_id)
+    rows = as_dicts(paginate(query, Solution.id, page, response))
+    if not summary:
+        content_store.attach_rows(db, rows)
+    return json_response(rows, response)
+
+# Get one solution with its content
+@router.get("/solutions/{solution_id}", response_model=schemas.Solution)
+def get_solution(
+    solution_id: int,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    row = db.query(models.Solution, models.Subject.teacher_id).join(
+        models.Task, models.Task.id == models.Solution.task_id
+    ).join(
+        models.Subject, models.Subject.id == models.Task.subject_id
+    ).filter(models.Solution.id == solution_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    if row[1] != current_teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    solutions = db.query(models.Solution).filter(models.Solution.task_id == task_id).all()
-    return solutions
+    return content_store.attach(db, [row[0]])[0]
 
 # Evaluate a solution
 @router.post("/solutions/{solution_id}/evaluate", response_model=schemas.Solution)
@@ -210,58 +286,113 @@ def evaluate_solution(
 ):
     from datetime import datetime
     
-    solution = db.query(models.Solution).filter(models.Solution.id == solution_id).first()
-    if not solution:
+    # Lock first so the points read below are the ones this evaluation replaces
+    task_stats.lock_solutions(db, [solution_id])
+    
+    # Solution, task points, subject and owner in one query
+    row = db.query(models.Solution, models.Task.points, models.Subject.id, models.Subject.teacher_id).join(
+        models.Task, models.Task.id == models.Solution.task_id
+    ).join(
+        models.Subject, models.Subject.id == models.Task.subject_id
+    ).filter(models.Solution.id == solution_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Solution not found")
     
-    # Verify task belongs to teacher's subject
-    task = db.query(models.Task).filter(models.Task.id == solution.task_id).first()
-    subject = db.query(models.Subject).filter(
-        models.Subject.id == task.subject_id,
-        models.Subject.teacher_id == current_teacher.id
-    ).first()
-    if not subject:
+    solution, max_points, subject_id, teacher_id = row
+    if teacher_id != current_teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Validate points
-    if evaluation.points_earned < 0 or evaluation.points_earned > task.points:
-        raise HTTPException(status_code=400, detail=f"Points must be between 0 and {task.points}")
+    if evaluation.points_earned < 0 or evaluation.points_earned > max_points:
+        raise HTTPException(status_code=400, detail=f"Points must be between 0 and {max_points}")
     
+    previous_points = solution.points_earned
+    task_stats.record_evaluations(db, [(solution.task_id, previous_points, evaluation.points_earned)])
     solution.points_earned = evaluation.points_earned
     solution.evaluated_at = datetime.utcnow()
     db.commit()
     db.refresh(solution)
-    return solution
+    events.publish([events.solution_evaluated(
+        subject_id, solution.id, solution.task_id, solution.student_id, solution.points_earned, solution.evaluated_at,
+        previous_points,
+    )])
+    return content_store.attach(db, [solution])[0]
 
 
-# Get task details with stats
-@router.get("/tasks/{task_id}", response_model=schemas.TaskWithStats)
-def get_task_details(
-    task_id: int,
+# Evaluate many solutions in one transaction
+@router.post("/solutions/evaluate", response_model=List[schemas.BulkEvaluationResult])
+def bulk_evaluate(
+    request: schemas.BulkEvaluate,
     current_teacher: models.User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    from datetime import datetime
     
-    # Verify subject belongs to teacher
-    subject = db.query(models.Subject).filter(
-        models.Subject.id == task.subject_id,
-        models.Subject.teacher_id == current_teacher.id
-    ).first()
-    if not subject:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    # Lock first so the points read below are the ones this evaluation replaces
+    solution_ids = {item.solution_id for item in request.evaluations}
+    task_stats.lock_solutions(db, solution_ids)
     
-    # Count solutions
-    total_solutions = db.query(models.Solution).filter(
-        models.Solution.task_id == task_id
-    ).count()
+    # Task points and subject owner for every requested solution, in one query
+    rows = db.query(
+        models.Solution.id, models.Solution.task_id, models.Solution.student_id, models.Solution.points_earned,
+        models.Task.points, models.Task.subject_id, models.Subject.teacher_id
+    ).join(
+        models.Task, models.Task.id == models.Solution.task_id
+    ).join(
+        models.Subject, models.Subject.id == models.Task.subject_id
+    ).filter(models.Solution.id.in_(solution_ids)).all()
+    max_points = {row.id: row.points for row in rows}
+    teacher_ids = {row.id: row.teacher_id for row in rows}
+    current = {row.id: (row.task_id, row.points_earned) for row in rows}
+    owners = {row.id: (row.subject_id, row.student_id) for row in rows}
     
-    evaluated_solutions = db.query(models.Solution).filter(
-        models.Solution.task_id == task_id,
-        models.Solution.points_earned != None
-    ).count()
+    now = datetime.utcnow()
+    results = []
+    updates = {}
+    for item in request.evaluations:
+        if item.solution_id not in max_points:
+            results.append({"solution_id": item.solution_id, "status": "not_found"})
+            continue
+        if teacher_ids[item.solution_id] != current_teacher.id:
+            results.append({"solution_id": item.solution_id, "status": "forbidden"})
+        elif item.points_earned < 0 or item.points_earned > max_points[item.solution_id]:
+            results.append({
+                "solution_id": item.solution_id,
+                "status": "invalid_points",
+                "detail": f"Points must be between 0 and {max_points[item.solution_id]}",
+            })
+        else:
+            updates[item.solution_id] = {"id": item.solution_id, "points_earned": item.points_earned, "evaluated_at": now}
+            results.append({"solution_id": item.solution_id, "status": "evaluated"})
+    
+    # Bulk UPDATE by primary key, executed as a single executemany
+    if updates:
+        db.execute(update(models.Solution), list(updates.values()))
+        task_stats.record_evaluations(db, [
+            (*current[solution_id], values["points_earned"]) for solution_id, values in updates.items()
+        ])
+        db.commit()
+        events.publish([
+            events.solution_evaluated(
+                owners[solution_id][0], solution_id, current[solution_id][0], owners[solution_id][1],
+                values["points_earned"], now, current[solution_id][1],
+            )
+            for solution_id, values in updates.items()
+        ])
+    return results
+
+
+# Get task details with stats
+@router.get("/tasks/{task_id}", response_model=schemas.TaskWithStats)
+def get_task_details(
+    task_id: int,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    # Ownership check and the maintained counters in one query, independent of solution volume
+    task, total_solutions, evaluated_solutions, points_sum = get_owned_task(
+        db, task_id, current_teacher.id, *task_stats.stats_columns(models.Task.id)
+    )
     
     # Create response with stats
     task_dict = {
@@ -273,7 +404,165 @@ def get_task_details(
         "created_at": task.created_at,
         "updated_at": task.updated_at,
         "total_solutions": total_solutions,
-        "evaluated_solutions": evaluated_solutions
+        "evaluated_solutions": evaluated_solutions,
+        "average_points": points_sum / evaluated_solutions if evaluated_solutions else None
     }
     
-    return task_dict
\ No newline at end of file
+    return task_dict
+
+# Stream every solution of a task as CSV/NDJSON
+@router.get("/tasks/{task_id}/export")
+def export_task_solutions(
+    request: Request,
+    task_id: int,
+    format: schemas.ExportFormat = Query("csv"),
+    gzip: bool = False,
+    include_content: bool = False,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    get_owned_task(db, task_id, current_teacher.id)
+    statement = solutions_statement(models.Solution.task_id == task_id, include_content=include_content)
+    return export_response(statement, f"task-{task_id}-solutions", format, gzip, read_session_factory(request))
+
+# Stream every solution of a subject as CSV/NDJSON
+@router.get("/subjects/{subject_id}/export")
+def export_subject_solutions(
+    request: Request,
+    subject_id: int,
+    format: schemas.ExportFormat = Query("csv"),
+    gzip: bool = False,
+    include_content: bool = False,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    subject = db.query(models.Subject.id).filter(
+        models.Subject.id == subject_id,
+        models.Subject.teacher_id == current_teacher.id,
+        models.Subject.deleted_at == None
+    ).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    statement = solutions_statement(models.Task.subject_id == subject_id, include_content=include_content)
+    return export_response(statement, f"subject-{subject_id}-solutions", format, gzip, read_session_factory(request))
+
+# Full-text search over the teacher's subjects
+@router.get("/search/subjects", response_model=List[schemas.Subject])
+def search_subjects(
+    response: Response,
+    params: search.SearchParams = Depends(),
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    query = search.matching(
+        db, models.Subject, params.q,
+        models.Subject.teacher_id == current_teacher.id,
+        models.Subject.deleted_at == None
+    )
+    return search.paginate_ranked(query, params, response)
+
+# Full-text search over the teacher's tasks, optionally within one subject
+@router.get("/search/tasks", response_model=List[schemas.Task])
+def search_tasks(
+    response: Response,
+    params: search.SearchParams = Depends(),
+    subject_id: Optional[int] = None,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    filters = [models.Subject.teacher_id == current_teacher.id, models.Subject.deleted_at == None]
+    if subject_id is not None:
+        filters.append(models.Task.subject_id == subject_id)
+    query = search.matching(db, models.Task, params.q, *filters)
+    if query is not None:
+        query = query.join(models.Subject, models.Subject.id == models.Task.subject_id)
+    return search.paginate_ranked(query, params, response)
+
+# Full-text search over submitted solutions, optionally for one task
+@router.get("/search/solutions", response_model=List[schemas.Solution], dependencies=[Depends(limits.limit("solutions"))])
+def search_solutions(
+    response: Response,
+    params: search.SearchParams = Depends(),
+    task_id: Optional[int] = None,
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    filters = [models.Subject.teacher_id == current_teacher.id, models.Subject.deleted_at == None]
+    if task_id is not None:
+        filters.append(models.Solution.task_id == task_id)
+    query = search.matching(db, models.Solution, params.q, *filters)
+    if query is not None:
+        query = query.join(models.Task, models.Task.id == models.Solution.task_id).join(
+            models.Subject, models.Subject.id == models.Task.subject_id
+        )
+    return content_store.attach(db, search.paginate_ranked(query, params, response))
+
+# Student x task score matrix for a subject
+@router.get("/subjects/{subject_id}/gradebook", response_model=schemas.Gradebook)
+def get_gradebook(
+    subject_id: int,
+    attempt: schemas.GradebookAttempt = Query("best"),
+    current_teacher: models.User = Depends(get_current_teacher),
+    db: Session = Depends(get_read_db)
+):
+    tasks = db.query(models.Task.id, models.Task.name, models.Task.points).join(
+        models.Subject, models.Subject.id == models.Task.subject_id
+    ).filter(
+        models.Subject.id == subject_id,
+        models.Subject.teacher_id == current_teacher.id,
+        models.Subject.deleted_at == None
+    ).order_by(models.Task.id).all()
+    if not tasks:
+        exists = db.query(models.Subject.id).filter(
+            models.Subject.id == subject_id,
+            models.Subject.teacher_id == current_teacher.id,
+            models.Subject.deleted_at == None
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Subject not found")
+    
+    # Every enrolled student, with one row per task they attempted
+    scores = attempt_scores(db, attempt, models.Task.subject_id == subject_id)
+    rows = db.query(
+        models.User.id, models.User.username, scores.c.task_id, scores.c.score
+    ).join(
+        models.student_subjects, models.student_subjects.c.user_id == models.User.id
+    ).outerjoin(
+        scores, scores.c.student_id == models.User.id
+    ).filter(
+        models.student_subjects.c.subject_id == subject_id
+    ).order_by(models.User.username).all()
+    
+    students = {}
+    for student_id, username, task_id, score in rows:
+        row = students.setdefault(student_id, schemas.GradebookRow(student_id=student_id, username=username))
+        if task_id is not None:
+            row.scores[task_id] = score
+            row.total += score or 0
+    
+    return {
+        "subject_id": subject_id,
+        "attempt": attempt,
+        "tasks": [{"id": t.id, "name": t.name, "points": t.points} for t in tasks],
+        "students": list(students.values()),
+    }
+
+# Live feed of a subject's new solutions, evaluations and task changes
+@router.get("/subjects/{subject_id}/events")
+def subject_events(
+    subject_id: int,
+    current_user: models.User = Depends(auth.get_stream_user),
+    db: Session = Depends(get_read_db)
+):
+    if not current_user.is_teacher:
+        raise HTTPException(status_code=403, detail="Only teachers can access this")
+    subject = db.query(models.Subject.id).filter(
+        models.Subject.id == subject_id,
+        models.Subject.teacher_id == current_user.id,
+        models.Subject.deleted_at == None
+    ).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    # The stream needs no database; don't hold a connection for its lifetime
+    db.close()
+    return events.event_stream([f"subject:{subject_id}", f"tasks:{subject_id}"])
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Literal
 
 # User Schemas
 class UserBase(BaseModel):
@@ -27,6 +27,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
+
 class TokenData(BaseModel):
     email: Optional[str] = None
 
@@ -57,6 +61,13 @@ class Subject(SubjectBase):
 class SubjectWithStudents(Subject):
     students: List[User] = []
 
+class BulkEnroll(BaseModel):
+    subject_ids: List[int] = Field(..., min_length=1, max_length=200)
+
+class BulkEnrollResult(BaseModel):
+    subject_id: int
+    status: Literal["enrolled", "already_enrolled", "not_found"]
+
 # Task Schemas
 class TaskBase(BaseModel):
     name: str
@@ -81,6 +92,7 @@ class Task(TaskBase):
 class TaskWithStats(Task):
     total_solutions: int = 0
     evaluated_solutions: int = 0
+    average_points: Optional[float] = None
 
 
 # Solution Schemas
@@ -93,6 +105,17 @@ class SolutionCreate(SolutionBase):
 class SolutionEvaluate(BaseModel):
     points_earned: int
 
+class BulkEvaluationItem(SolutionEvaluate):
+    solution_id: int
+
+class BulkEvaluate(BaseModel):
+    evaluations: List[BulkEvaluationItem] = Field(..., min_length=1, max_length=1000)
+
+class BulkEvaluationResult(BaseModel):
+    solution_id: int
+    status: Literal["evaluated", "not_found", "forbidden", "invalid_points"]
+    detail: Optional[str] = None
+
 class Solution(SolutionBase):
     id: int
     task_id: int
@@ -102,4 +125,47 @@ class Solution(SolutionBase):
     evaluated_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SolutionSummary(BaseModel):
+    id: int
+    task_id: int
+    student_id: int
+    content_size: int
+    points_earned: Optional[int] = None
+    submitted_at: datetime
+    evaluated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Gradebook Schemas
+GradebookAttempt = Literal["best", "latest"]
+ExportFormat = Literal["csv", "ndjson"]
+
+class GradebookTask(BaseModel):
+    id: int
+    name: str
+    points: int
+
+class GradebookRow(BaseModel):
+    student_id: int
+    username: str
+    scores: Dict[int, Optional[int]] = {}
+    total: int = 0
+
+class Gradebook(BaseModel):
+    subject_id: int
+    attempt: GradebookAttempt
+    tasks: List[GradebookTask]
+    students: List[GradebookRow]
+
+class SubjectGrade(BaseModel):
+    subject_id: int
+    name: str
+    code: str
+    task_count: int
+    graded_tasks: int
+    points_earned: int
+    points_possible: int
@@ -0,0 +1,192 @@
+"""Full-text search over subjects, tasks and solutions.
+
+SQLite keeps an FTS5 table per searchable table (``subjects_fts`` ...), keyed
+by the source row id and written by the same handlers that write the row.
+PostgreSQL uses a GIN index on a weighted ``tsvector`` expression, which the
+database maintains itself, except for solutions: their bodies live in the
+content store, so they get a ``solutions_fts`` side table there as well.
+Rebuild the indexes after bulk loads with:
+
+    python -m app.search
+"""
+import re
+from typing import Optional
+from fastapi import Query, Response
+from sqlalchemy import column, event, func, insert, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from . import content_store, models
+from .database import Base, dialect_name
+
+MAX_RESULTS = 100
+MAX_TERMS = 16
+
+# Searchable text columns per model, most important (highest weight) first
+COLUMNS = {
+    models.Subject: ("name", "code", "description"),
+    models.Task: ("name", "description"),
+    models.Solution: ("content",),
+}
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+POSTGRES_WEIGHTS = "ABC"
+# Text kept outside the model's own table; indexed from the write path on every dialect
+EXTERNAL = {models.Solution}
+REBUILD_BATCH = 1000
+
+
+class SearchParams:
+    """Search query parameters.
+
+    Results are ordered by relevance, so ``cursor`` is an opaque position
+    rather than an id; the next one is returned in ``X-Next-Cursor``.
+    """
+
+    def __init__(
+        self,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=MAX_RESULTS),
+        cursor: Optional[int] = Query(None, ge=0),
+    ):
+        self.q = q
+        self.limit = limit
+        self.cursor = cursor or 0
+
+
+def fts_table(model):
+    return table(f"{model.__tablename__}_fts", column("rowid"), column("document"), *(column(name) for name in COLUMNS[model]))
+
+
+def postgres_vector(model, prefix: str = "") -> str:
+    """Weighted tsvector over the model's columns, each written as ``prefix + name``."""
+    return " || ".join(
+        f"setweight(to_tsvector('english', coalesce({prefix}{name}, '')), '{weight}')"
+        for name, weight in zip(COLUMNS[model], POSTGRES_WEIGHTS)
+    )
+
+
+def create(connection):
+    """Create the full-text indexes (idempotent)."""
+    for model, names in COLUMNS.items():
+        if connection.dialect.name == "sqlite":
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table(model).name} "
+                f"USING fts5({', '.join(names)}, tokenize='porter unicode61')"
+            ))
+        elif connection.dialect.name == "postgresql" and model in EXTERNAL:
+            fts = fts_table(model).name
+            connection.execute(text(f"CREATE TABLE IF NOT EXISTS {fts} (rowid bigint PRIMARY KEY, document tsvector NOT NULL)"))
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{fts}_document ON {fts} USING gin (document)"))
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{model.__tablename__}_search "
+                f"ON {model.__tablename__} USING gin (({postgres_vector(model)}))"
+            ))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_with_schema(target, connection, **kw):
+    create(connection)
+
+
+def rebuild(connection, models_to_index=None):
+    """Repopulate the side tables of ``models_to_index`` (default: all)."""
+    for model in models_to_index or COLUMNS:
+        if model in EXTERNAL:
+            _rebuild_external(connection, model)
+        elif connection.dialect.name == "sqlite":
+            names = ", ".join(COLUMNS[model])
+            fts = fts_table(model).name
+            connection.execute(text(f"DELETE FROM {fts}"))
+            connection.execute(text(
+                f"INSERT INTO {fts}(rowid, {names}) SELECT id, {names} FROM {model.__tablename__}"
+            ))
+
+
+def _rebuild_external(connection, model):
+    # Solution bodies are read back from the content store in batches
+    connection.execute(text(f"DELETE FROM {fts_table(model).name}"))
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            select(model.id, model.content_hash).where(model.id > last_id).order_by(model.id).limit(REBUILD_BATCH)
+        ).all()
+        if not batch:
+            return
+        bodies = content_store.load(connection, [content_hash for _, content_hash in batch])
+        index(connection, model, [{"id": row_id, "content": bodies.get(content_hash, "")} for row_id, content_hash in batch])
+        last_id = batch[-1][0]
+
+
+def index(db, model, rows):
+    """Write ``rows`` (dicts with ``id`` and the text columns) to the index."""
+    if not rows:
+        return
+    names = COLUMNS[model]
+    dialect = dialect_name(db)
+    if dialect == "sqlite":
+        db.execute(
+            insert(fts_table(model)).prefix_with("OR REPLACE"),
+            [{"rowid": row["id"], **{name: row[name] for name in names}} for row in rows],
+        )
+    elif dialect == "postgresql" and model in EXTERNAL:
+        db.execute(text(
+            f"INSERT INTO {fts_table(model).name} (rowid, document) VALUES (:id, {postgres_vector(model, ':')}) "
+            f"ON CONFLICT (rowid) DO UPDATE SET document = excluded.document"
+        ), [{"id": row["id"], **{name: row[name] for name in names}} for row in rows])
+
+
+def index_object(db: Session, obj):
+    """Index a flushed ORM object in the current transaction."""
+    model = type(obj)
+    index(db, model, [{"id": obj.id, **{name: getattr(obj, name) for name in COLUMNS[model]}}])
+
+
+def terms(q: str):
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def matching(db: Session, model, q: str, *filters):
+    """``db.query(model)`` restricted to rows matching every term of ``q`` and
+    ``filters``, ordered by relevance. Terms match as prefixes
+    (search-as-you-type). Returns ``None`` when ``q`` has no searchable terms.
+    """
+    words = terms(q)
+    if not words:
+        return None
+    fts = fts_table(model)
+    if dialect_name(db) == "postgresql":
+        query = func.to_tsquery(literal_column("'english'"), " & ".join(f"{word}:*" for word in words))
+        if model in EXTERNAL:
+            vector = fts.c.document
+            base = db.query(model).join(fts, fts.c.rowid == model.id)
+        else:
+            vector = literal_column(postgres_vector(model, f"{model.__tablename__}."))
+            base = db.query(model)
+        return base.filter(vector.op("@@")(query), *filters).order_by(
+            func.ts_rank(vector, query).desc(), model.id
+        )
+
+    match = " ".join(f'"{word}"*' for word in words)
+    rank = func.bm25(literal_column(fts.name), *SQLITE_WEIGHTS[:len(COLUMNS[model])])
+    return db.query(model).join(fts, fts.c.rowid == model.id).filter(
+        literal_column(fts.name).op("MATCH")(match), *filters
+    ).order_by(rank, model.id)
+
+
+def paginate_ranked(query, params: SearchParams, response: Response):
+    """One page of a ranked query; the next cursor is the next offset."""
+    if query is None:
+        return []
+    rows = query.offset(params.cursor).limit(params.limit + 1).all()
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        response.headers["X-Next-Cursor"] = str(params.cursor + params.limit)
+    return rows
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    with engine.begin() as connection:
+        create(connection)
+        rebuild(connection)
+    print("Rebuilt search indexes")
@@ -0,0 +1,155 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import content_store, models, schemas, search, task_stats
+from .config import settings
+from .database import SessionLocal
+
+
+def insert_solutions(db: Session, rows: List[dict]) -> List[schemas.Solution]:
+    """Insert solution rows in one executemany with RETURNING; the caller commits.
+
+    Every write of new solutions goes through here, whether per request or
+    batched, so anything that must happen in the same transaction belongs here.
+    """
+    contents = [row["content"] for row in rows]
+    refs = content_store.save(db, contents)
+    solutions = db.scalars(
+        insert(models.Solution).returning(models.Solution, sort_by_parameter_order=True),
+        [
+            {**{k: v for k, v in row.items() if k != "content"}, "content_hash": content_hash, "content_size": size}
+            for row, (content_hash, size) in zip(rows, refs)
+        ],
+    ).all()
+    for solution, content in zip(solutions, contents):
+        solution.content = content
+    task_stats.record_submissions(db, [solution.task_id for solution in solutions])
+    search.index(db, models.Solution, [{"id": solution.id, "content": solution.content} for solution in solutions])
+    return [schemas.Solution.model_validate(solution) for solution in solutions]
+
+
+class SubmissionTimeout(Exception):
+    """The row was not written in time and has been withdrawn from the queue."""
+
+
+class SubmissionBatcher:
+    """Group commit for submissions.
+
+    Requests enqueue an already validated row and await, on the event loop,
+    the writer thread's commit of the batch containing it. A batch is flushed
+    when it holds ``max_batch`` rows or ``max_wait_ms`` after its first row
+    arrived, turning one fsync per submission into one per batch.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = 100, max_wait_ms: float = 10):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, row: dict, timeout: float = None) -> schemas.Solution:
+        """Queue ``row`` and wait for its batch without holding a thread.
+
+        Raises SubmissionTimeout if the row is still queued after ``timeout``;
+        it is then never written, so the client can safely retry.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((row, future))
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                raise SubmissionTimeout()
+        # The writer already took the row: its commit is under way, wait for the outcome
+        return await asyncio.wrap_future(future)
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        # Drop rows whose waiter gave up; the rest can no longer be cancelled
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            self._write(batch)
+        except Exception:
+            # One bad row must not fail its neighbours: retry them one by one
+            for item in batch:
+                try:
+                    self._write([item])
+                except Exception as exc:
+                    item[1].set_exception(exc)
+
+    def _write(self, batch):
+        with self.session_factory() as db:
+            try:
+                results = insert_solutions(db, [row for row, _ in batch])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        self.batches += 1
+        self.rows += len(batch)
+        # Acknowledge only now that the batch is durable
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+batcher = SubmissionBatcher(
+    max_batch=settings.SUBMISSION_BATCH_SIZE,
+    max_wait_ms=settings.SUBMISSION_BATCH_WAIT_MS,
+)
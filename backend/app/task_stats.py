@@ -0,0 +1,117 @@
+"""Incrementally maintained per-task solution statistics.
+
+The write paths report deltas here inside their own transaction, so
+``task_stats`` always matches ``solutions`` once committed. Rebuild it from
+scratch (e.g. after bulk loads or manual fixes) with:
+
+    python -m app.task_stats
+"""
+from collections import defaultdict
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from . import models
+
+TaskStats = models.TaskStats
+COUNTERS = ("total_solutions", "evaluated_solutions", "points_sum")
+
+
+def _upsert_statement(dialect_name):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(TaskStats)
+    return stmt.on_conflict_do_update(
+        index_elements=[TaskStats.task_id],
+        set_={name: getattr(TaskStats, name) + getattr(stmt.excluded, name) for name in COUNTERS},
+    )
+
+
+def apply_deltas(db: Session, deltas):
+    """Add ``{task_id: [total, evaluated, points]}`` to the counters (upsert)."""
+    rows = [
+        dict(zip(("task_id",) + COUNTERS, (task_id, *values)))
+        for task_id, values in sorted(deltas.items())  # fixed order avoids lock-order deadlocks
+        if any(values)
+    ]
+    if not rows:
+        return
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = db.query(TaskStats).filter(TaskStats.task_id == row["task_id"]).update(
+            {name: getattr(TaskStats, name) + row[name] for name in COUNTERS}
+        )
+        if not updated:
+            db.execute(insert(TaskStats), [row])
+
+
+def record_submissions(db: Session, task_ids):
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for task_id in task_ids:
+        deltas[task_id][0] += 1
+    apply_deltas(db, deltas)
+
+
+def lock_solutions(db: Session, solution_ids):
+    """Lock solutions before reading the points an evaluation will replace.
+
+    A no-op UPDATE takes the row locks (on SQLite, the write lock) first, so
+    concurrent graders of a solution queue here and each then reads the points
+    the previous one committed. ``SELECT ... FOR UPDATE`` is not enough: SQLite
+    ignores it and pysqlite runs plain reads outside the transaction.
+    """
+    Solution = models.Solution
+    db.query(Solution).filter(Solution.id.in_(solution_ids)).update(
+        {Solution.points_earned: Solution.points_earned}, synchronize_session=False
+    )
+
+
+def record_evaluations(db: Session, changes):
+    """``changes`` holds ``(task_id, old_points, new_points)`` per evaluated solution.
+
+    The old points must have been read after ``lock_solutions`` in the same
+    transaction, or concurrent evaluations make the counters drift.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for task_id, old_points, new_points in changes:
+        if old_points is None:
+            deltas[task_id][1] += 1
+        deltas[task_id][2] += new_points - (old_points or 0)
+    apply_deltas(db, deltas)
+
+
+def rebuild(connection):
+    """Recompute every row from ``solutions``."""
+    Solution = models.Solution
+    aggregate = select(
+        models.Task.id,
+        func.count(Solution.id),
+        func.count(Solution.points_earned),
+        func.coalesce(func.sum(Solution.points_earned), 0),
+    ).select_from(models.Task).outerjoin(
+        Solution, Solution.task_id == models.Task.id
+    ).group_by(models.Task.id)
+    connection.execute(TaskStats.__table__.delete())
+    connection.execute(
+        insert(TaskStats).from_select(["task_id", *COUNTERS], aggregate)
+    )
+
+
+def stats_columns(task_id_column):
+    """Scalar subqueries reading a task's counters by primary key."""
+    def counter(name):
+        return select(getattr(TaskStats, name)).where(TaskStats.task_id == task_id_column).scalar_subquery()
+    return [func.coalesce(counter(name), 0) for name in COUNTERS]
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    with engine.begin() as connection:
+        rebuild(connection)
+    print("Rebuilt task_stats")
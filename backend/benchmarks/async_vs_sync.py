@@ -0,0 +1,113 @@
+"""Compare the app's sync and async modes on the real hot read routes.
+
+Generates one SQLite database, then runs the app twice in fresh processes:
+with ``DATABASE_URL=sqlite:///...`` (sync routes on FastAPI's threadpool) and
+with ``sqlite+aiosqlite:///...`` (async routes on the event loop). Each run
+drives the catalog, both task lists and my-solutions through the full app
+(middleware, auth, caches) with an in-process ASGI client:
+
+    python -m benchmarks.async_vs_sync --requests 2000 --concurrency 200
+
+Both modes get a connection pool of ``--pool-size`` (default: one connection
+per request in flight). With a smaller pool, such as the default 10 + 20
+overflow, the sync mode can time out: a sync request holds its connection
+until its session is closed on a threadpool thread, and every thread may be
+waiting for a connection. The async mode just queues for the pool.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import drive, print_report
+
+PASSWORD = "password123"
+
+
+async def child(args):
+    import httpx
+    from app.main import app
+
+    target = json.loads(os.environ["BENCH_TARGET"])
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login(email):
+                response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+                response.raise_for_status()
+                return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            student = await login(target["student"])
+            teacher = await login(target["teacher"])
+            routes = {
+                "catalog": ("/api/student/subjects?limit=50", None),
+                "student tasks": (f"/api/student/subjects/{target['subject_id']}/tasks", student),
+                "teacher tasks": (f"/api/teacher/subjects/{target['subject_id']}/tasks", teacher),
+                "my-solutions": (f"/api/student/tasks/{target['task_id']}/my-solutions", student),
+            }
+            for name, (path, headers) in routes.items():
+                (await client.get(path, headers=headers)).raise_for_status()
+                results[name] = await drive(
+                    lambda i, path=path, headers=headers: client.get(path, headers=headers),
+                    args.requests, args.concurrency,
+                )
+    print(json.dumps(results))
+
+
+def pick_target(path):
+    # The student with the most attempts at one task, in a subject they are enrolled in
+    with sqlite3.connect(path) as db:
+        student, teacher, subject_id, task_id = db.execute(
+            "SELECT s.email, t.email, tasks.subject_id, solutions.task_id FROM solutions "
+            "JOIN tasks ON tasks.id = solutions.task_id JOIN subjects ON subjects.id = tasks.subject_id "
+            "JOIN users s ON s.id = solutions.student_id JOIN users t ON t.id = subjects.teacher_id "
+            "GROUP BY solutions.student_id, solutions.task_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+    return {"student": student, "teacher": teacher, "subject_id": subject_id, "task_id": task_id}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--subjects", type=int, default=50)
+    parser.add_argument("--solutions", type=int, default=20000)
+    parser.add_argument("--pool-size", type=int, help="DB_POOL_SIZE, without overflow (default: --concurrency)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args))
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", BCRYPT_ROUNDS="4", PASSWORD_HASH_WORKERS="0")
+    subprocess.run(
+        [sys.executable, "generate_data.py", "--teachers", "5", "--subjects", str(args.subjects), "--students", "500",
+         "--solutions", str(args.solutions), "--prefix", "bench", "--password", PASSWORD],
+        env=env, check=True, capture_output=True,
+    )
+    env["BENCH_TARGET"] = json.dumps(pick_target(path))
+
+    pool_size = args.pool_size or args.concurrency
+    print(f"{args.requests} requests per route, {args.concurrency} in flight, {pool_size} pooled connections")
+    for mode, url in (("sync", f"sqlite:///{path}"), ("async", f"sqlite+aiosqlite:///{path}")):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_vs_sync", "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=dict(env, DATABASE_URL=url, AUTO_MIGRATE="false", DB_POOL_SIZE=str(pool_size), DB_MAX_OVERFLOW="0"),
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            print(f"{mode:<28} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        for name, report in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            print_report(f"{mode} {name}", report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold start: time from importing the app to the first successful requests.
+
+Each run is a new process that imports ``app.main``, runs the lifespan
+startup, then sends ``GET /health/ready`` and a first login. Runs against a
+fresh database (schema created at startup), a migrated one with
+AUTO_MIGRATE on, and a migrated one with AUTO_MIGRATE off (how deployments
+start workers after ``python -m app.migrations``):
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ("import", "startup", "ready", "login", "process")
+
+
+async def child():
+    start = time.perf_counter()
+    import httpx
+    from app.main import app
+    phases = {"import": time.perf_counter() - start}
+
+    async with app.router.lifespan_context(app):
+        phases["startup"] = time.perf_counter() - start
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+            response = await client.get("/health/ready")
+            response.raise_for_status()
+            phases["ready"] = time.perf_counter() - start
+            response = await client.post(
+                "/api/auth/login", data={"username": "teacher1@test.com", "password": "teacher123"}
+            )
+            phases["login"] = time.perf_counter() - start if response.status_code == 200 else None
+    print(json.dumps(phases))
+
+
+def run(database_url, auto_migrate):
+    env = dict(os.environ, DATABASE_URL=database_url, AUTO_MIGRATE=auto_migrate, PASSWORD_HASH_WORKERS="0")
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases["process"] = time.perf_counter() - start
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child())
+        return
+
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    directory = tempfile.mkdtemp()
+    migrated_url = f"sqlite:///{os.path.join(directory, 'migrated.db')}"
+    subprocess.run([sys.executable, "seed.py"], env=dict(os.environ, DATABASE_URL=migrated_url), check=True, capture_output=True)
+
+    scenarios = [
+        ("fresh db, AUTO_MIGRATE=true", lambda n: f"sqlite:///{os.path.join(directory, f'fresh{n}.db')}", "true"),
+        ("migrated db, AUTO_MIGRATE=true", lambda n: migrated_url, "true"),
+        ("migrated db, AUTO_MIGRATE=false", lambda n: migrated_url, "false"),
+    ]
+    print(f"median of {args.runs} runs, ms since the child started importing the app ('process' is the child's wall time)")
+    print(f"{'scenario':<34}" + "".join(f"{phase:>10}" for phase in PHASES))
+    for label, url, auto_migrate in scenarios:
+        results = [run(url(n), auto_migrate) for n in range(args.runs)]
+        cells = []
+        for phase in PHASES:
+            values = [result[phase] for result in results if result[phase] is not None]
+            cells.append(f"{statistics.median(values) * 1000:>10.0f}" if values else f"{'-':>10}")
+        print(f"{label:<34}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()
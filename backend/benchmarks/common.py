@@ -0,0 +1,85 @@
+import asyncio
+import re
+import time
+from collections import defaultdict
+from statistics import mean
+
+# Numeric path segments are ids: /api/student/tasks/7 -> /api/student/tasks/{id}
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies, elapsed, errors=0, statements=None):
+    """Turn per-request latencies (seconds) into a report with ms figures.
+
+    ``statements`` are per-request SQL statement counts (X-DB-Queries), when
+    the server reports them.
+    """
+    report = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    if statements:
+        report["sql_per_request"] = mean(statements)
+    return report
+
+def endpoint(response):
+    """Method and path template of the request behind ``response``."""
+    return f"{response.request.method} {ID_SEGMENT.sub('/{id}', response.request.url.path)}"
+
+async def drive(send, total, concurrency):
+    """Call ``send(i)`` ``total`` times with at most ``concurrency`` in flight.
+
+    ``send`` is a coroutine function returning an httpx response; any status
+    of 400 or above counts as an error. Besides the totals, the report has the
+    same figures per endpoint under ``"endpoints"``, since one scenario may mix
+    several and an aggregate can hide a regression in one of them.
+    """
+    latencies = []
+    statements = []
+    errors = 0
+    endpoints = defaultdict(lambda: {"latencies": [], "statements": [], "errors": 0})
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(i)
+            latency = time.perf_counter() - start
+            stats = endpoints[endpoint(response)]
+            latencies.append(latency)
+            stats["latencies"].append(latency)
+            if response.status_code >= 400:
+                errors += 1
+                stats["errors"] += 1
+            if "x-db-queries" in response.headers:
+                statements.append(int(response.headers["x-db-queries"]))
+                stats["statements"].append(statements[-1])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    report = summarize(latencies, elapsed, errors, statements)
+    report["endpoints"] = {
+        name: summarize(stats["latencies"], elapsed, stats["errors"], stats["statements"])
+        for name, stats in sorted(endpoints.items())
+    }
+    return report
+
+def print_report(name, report):
+    sql = f"  sql/req {report['sql_per_request']:.1f}" if "sql_per_request" in report else ""
+    print(
+        f"{name:<28} {report['requests']:>6} req  {report['rps']:>9.1f} req/s  "
+        f"p50 {report['p50_ms']:>8.2f} ms  p99 {report['p99_ms']:>8.2f} ms  errors {report['errors']}{sql}"
+    )
@@ -0,0 +1,55 @@
+"""Check that every statement issued by the budgeted endpoints uses an index.
+
+Runs the endpoints from benchmarks.query_budget against SQLite, records each
+SELECT/UPDATE/DELETE they issue and runs EXPLAIN QUERY PLAN on it. A plan
+step that scans a table without an index fails the check:
+
+    python -m benchmarks.explain_queries
+"""
+import re
+import sys
+
+from benchmarks.query_budget import call_endpoints, configure_environment, seed
+
+# "SCAN solutions" is a full table scan; "SCAN x USING [COVERING] INDEX" is not
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+def main():
+    configure_environment("explain.db")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.database import engine
+    from app.main import app
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements[-1][1].append((statement, parameters))
+
+    failures = 0
+    with TestClient(app) as client:
+        ids, headers = seed(client)
+        event.listen(engine, "before_cursor_execute", record)
+        endpoints = []
+        statements.append((None, []))
+        for method, template, _, response in call_endpoints(client, ids, headers):
+            endpoints.append((method, template, statements[-1][1]))
+            statements.append((None, []))
+        event.remove(engine, "before_cursor_execute", record)
+
+        with engine.connect() as connection:
+            for method, template, recorded in endpoints:
+                for statement, parameters in recorded:
+                    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                    scans = [step[3] for step in plan if FULL_SCAN.match(step[3])]
+                    failures += bool(scans)
+                    status = "FAIL" if scans else "ok "
+                    first_line = " ".join(statement.split())[:90]
+                    print(f"{status} {method:<5} {template:<48} {first_line}")
+                    for scan in scans:
+                        print(f"       full scan: {scan}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
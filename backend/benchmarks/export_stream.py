@@ -0,0 +1,68 @@
+"""Check that solution exports stream in constant memory.
+
+Generates one subject per size with generate_data.py into a fresh SQLite
+database, then drains the subject export and reports time to first byte,
+total time and the peak Python heap (tracemalloc) while streaming:
+
+    python -m benchmarks.export_stream --sizes 10000 100000 --format ndjson --gzip
+
+Peak memory should stay roughly the same across sizes.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+
+
+async def drain(body, start):
+    first_byte = None
+    total = 0
+    async for chunk in body:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        total += len(chunk)
+    return first_byte, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="solutions per export")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--include-content", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    from app import models
+    from app.database import SessionLocal
+    from app.export import export_response, solutions_statement
+    from generate_data import generate
+
+    for n, size in enumerate(args.sizes):
+        generate(Namespace(
+            teachers=1, subjects=1, students=200, enrollments_per_student=1, tasks_per_subject=20,
+            solutions=size, graded_fraction=0.5, days=30, seed=n, prefix=f"export{n}", password="password123",
+            batch_size=5000,
+        ))
+
+    print(f"{'solutions':>10} {'first byte':>11} {'total':>9} {'bytes':>12} {'peak heap':>10}")
+    with SessionLocal() as db:
+        subject_ids = [row.id for row in db.query(models.Subject.id).filter(models.Subject.code.like("EXPORT%")).order_by(models.Subject.id)]
+    for size, subject_id in zip(args.sizes, subject_ids):
+        statement = solutions_statement(models.Task.subject_id == subject_id, include_content=args.include_content)
+        response = export_response(statement, "bench", args.format, args.gzip)
+        tracemalloc.start()
+        start = time.perf_counter()
+        first_byte, total = asyncio.run(drain(response.body_iterator, start))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:>10,} {first_byte * 1000:>8.1f} ms {elapsed:>7.2f} s {total:>12,} {peak / 1e6:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
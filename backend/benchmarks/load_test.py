@@ -0,0 +1,222 @@
+"""Mixed-scenario load test with JSON baselines for regression checks.
+
+Drives the API with the scenarios below, either in-process (default: a
+fresh SQLite database filled by generate_data.py) or against a running
+server with --url (which must serve data made by generate_data.py with the
+default prefix and password). Reports req/s, p50/p95/p99 latency and SQL
+statements per request, for each scenario and each endpoint it calls.
+
+    python -m benchmarks.load_test --output baseline.json
+    python -m benchmarks.load_test --baseline baseline.json --threshold 0.25
+
+With --baseline the run exits non-zero when any scenario's p95 latency or
+throughput is worse than the baseline by more than the threshold, or when
+it issues more SQL statements per request, for each scenario and each endpoint it calls.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from argparse import Namespace
+from datetime import datetime
+
+import httpx
+
+from benchmarks.common import drive, print_report
+
+PREFIX = "gen"
+PASSWORD = "password123"
+
+
+class Context:
+    """Tokens and ids discovered through the API before measuring."""
+
+    def __init__(self, client):
+        self.client = client
+        self.student_headers = []
+        self.teacher_headers = []
+        self.student_tasks = []
+        self.teacher_tasks = []
+        self.grading_queue = []
+
+    async def login(self, email):
+        response = await self.client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def prepare(self, students, teachers):
+        for n in range(students):
+            headers = await self.login(f"{PREFIX}_student{n}@test.com")
+            subjects = (await self.client.get("/api/student/my-subjects", headers=headers)).json()
+            for subject in subjects[:2]:
+                tasks = (await self.client.get(f"/api/student/subjects/{subject['id']}/tasks", headers=headers)).json()
+                self.student_tasks.extend((len(self.student_headers), task["id"]) for task in tasks[:3])
+            self.student_headers.append(headers)
+
+        for n in range(teachers):
+            headers = await self.login(f"{PREFIX}_teacher{n}@test.com")
+            subjects = (await self.client.get("/api/teacher/subjects", headers=headers)).json()
+            for subject in subjects[:2]:
+                tasks = (await self.client.get(f"/api/teacher/subjects/{subject['id']}/tasks", headers=headers)).json()
+                self.teacher_tasks.extend((len(self.teacher_headers), task["id"], task["points"]) for task in tasks[:5])
+            self.teacher_headers.append(headers)
+
+        if not self.student_tasks or not self.teacher_tasks:
+            raise SystemExit("No enrolled tasks found; generate data with generate_data.py first")
+
+
+async def login_storm(ctx, i):
+    n = i % max(1, len(ctx.student_headers))
+    data = {"username": f"{PREFIX}_student{n}@test.com", "password": PASSWORD}
+    return await ctx.client.post("/api/auth/login", data=data)
+
+async def catalog_browsing(ctx, i):
+    if i % 4 == 3:
+        student, task_id = ctx.student_tasks[i % len(ctx.student_tasks)]
+        return await ctx.client.get(f"/api/student/tasks/{task_id}/my-solutions", headers=ctx.student_headers[student])
+    return await ctx.client.get("/api/student/subjects", params={"limit": 50})
+
+async def submission_burst(ctx, i):
+    student, task_id = ctx.student_tasks[i % len(ctx.student_tasks)]
+    body = {"content": f"load test answer {i}", "task_id": task_id}
+    return await ctx.client.post(f"/api/student/tasks/{task_id}/submit", json=body, headers=ctx.student_headers[student])
+
+async def grading_loop(ctx, i):
+    teacher, task_id, points = ctx.teacher_tasks[i % len(ctx.teacher_tasks)]
+    headers = ctx.teacher_headers[teacher]
+    if i % 3 == 0:
+        return await ctx.client.get(f"/api/teacher/tasks/{task_id}", headers=headers)
+    if i % 3 == 1:
+        response = await ctx.client.get(
+            f"/api/teacher/tasks/{task_id}/solutions", params={"summary": "true", "limit": 50}, headers=headers
+        )
+        ctx.grading_queue.extend((teacher, s["id"], points) for s in response.json()[:5])
+        return response
+    if not ctx.grading_queue:
+        return await ctx.client.get(f"/api/teacher/tasks/{task_id}", headers=headers)
+    teacher, solution_id, points = ctx.grading_queue.pop()
+    return await ctx.client.post(
+        f"/api/teacher/solutions/{solution_id}/evaluate",
+        json={"points_earned": i % (points + 1)},
+        headers=ctx.teacher_headers[teacher],
+    )
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "catalog_browsing": catalog_browsing,
+    "submission_burst": submission_burst,
+    "grading_loop": grading_loop,
+}
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages against ``baseline``."""
+    failures = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if current["rps"] < base["rps"] * (1 - threshold):
+            failures.append(f"{name}: {current['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+        # Per endpoint, so a regression in one call of a mixed scenario still shows
+        for route, now in current.get("endpoints", {}).items():
+            before = base.get("endpoints", {}).get(route)
+            if not before:
+                continue
+            label = f"{name} {route}"
+            if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                failures.append(f"{label}: p95 {now['p95_ms']:.1f} ms vs baseline {before['p95_ms']:.1f} ms")
+            # Some branches depend on the data (re-grading an evaluated solution
+            # skips work), so averages drift slightly; an extra query per request does not
+            if now.get("sql_per_request", 0) > before.get("sql_per_request", float("inf")) + 0.1:
+                failures.append(
+                    f"{label}: {now['sql_per_request']:.2f} SQL statements/request "
+                    f"vs baseline {before['sql_per_request']:.2f}"
+                )
+            if now["errors"] > before["errors"]:
+                failures.append(f"{label}: {now['errors']} errors vs baseline {before['errors']}")
+    return failures
+
+
+def make_in_process_client(args):
+    # Measures raw capacity from a single client address
+    os.environ.setdefault("RATE_LIMITING", "false")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}")
+    os.environ.setdefault("BCRYPT_ROUNDS", "10")
+    from app.main import app
+    from generate_data import generate
+
+    generate(Namespace(
+        teachers=5, subjects=20, students=args.students, enrollments_per_student=3, tasks_per_subject=10,
+        solutions=args.solutions, graded_fraction=0.5, days=30, seed=1, prefix=PREFIX, password=PASSWORD,
+        batch_size=5000,
+    ))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test"), app
+
+
+async def run(args):
+    app = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        client, app = make_in_process_client(args)
+
+    async with client:
+        lifespan = app.router.lifespan_context(app) if app is not None else None
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            ctx = Context(client)
+            await ctx.prepare(students=min(args.students, 50), teachers=3)
+            results = {
+                "created_at": datetime.utcnow().isoformat(),
+                "target": args.url or "in-process",
+                "python": platform.python_version(),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "scenarios": {},
+            }
+            for name in args.scenarios:
+                scenario = SCENARIOS[name]
+                report = await drive(lambda i, scenario=scenario: scenario(ctx, i), args.requests, args.concurrency)
+                results["scenarios"][name] = report
+                print_report(name, report)
+                for route, endpoint_report in report["endpoints"].items():
+                    print_report(f"  {route}", endpoint_report)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--students", type=int, default=500, help="in-process data size")
+    parser.add_argument("--solutions", type=int, default=20000, help="in-process data size")
+    parser.add_argument("--output", help="write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
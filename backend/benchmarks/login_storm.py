@@ -0,0 +1,61 @@
+"""Login storm: many students logging in at once.
+
+Runs /api/auth/login against the real app in-process, first hashing inline
+on the request threads (PASSWORD_HASH_WORKERS=0, the old behaviour) and then
+through the bcrypt process pool, and reports p50/p99 latency for both.
+
+    python -m benchmarks.login_storm --users 200 --concurrency 100 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+def main(args):
+    # Measures raw capacity from a single client address
+    os.environ.setdefault("RATE_LIMITING", "false")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+
+    import httpx
+    from app import auth, models
+    from app.config import settings
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from benchmarks.common import drive, print_report
+
+    Base.metadata.create_all(bind=engine)
+    password_hash = auth.password_context().hash("password")
+    with SessionLocal() as db:
+        db.query(models.User).filter(models.User.email.like("storm%@test.com")).delete()
+        db.add_all(
+            models.User(username=f"storm{i}", email=f"storm{i}@test.com", hashed_password=password_hash)
+            for i in range(args.users)
+        )
+        db.commit()
+
+    async def storm(label):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login(i):
+                data = {"username": f"storm{i % args.users}@test.com", "password": "password"}
+                return await client.post("/api/auth/login", data=data)
+
+            await login(0)
+            print_report(label, await drive(login, args.requests, args.concurrency))
+
+    settings.PASSWORD_HASH_WORKERS = 0
+    asyncio.run(storm("inline bcrypt"))
+    settings.PASSWORD_HASH_WORKERS = args.workers
+    auth.shutdown_hash_executor()
+    asyncio.run(storm(f"process pool ({args.workers} workers)"))
+    auth.shutdown_hash_executor()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    main(parser.parse_args())
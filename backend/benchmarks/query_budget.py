@@ -0,0 +1,100 @@
+"""Fail when an endpoint issues more SQL statements than its budget.
+
+Seeds a throwaway SQLite database, calls each endpoint in QUERY_BUDGETS with
+warm auth caches, and compares the X-DB-Queries header against the budget.
+Exits non-zero on any regression so it can run in CI:
+
+    python -m benchmarks.query_budget
+"""
+import os
+import sys
+import tempfile
+
+# (method, path template, role, max statements on a cold response cache;
+# cached list endpoints spend one extra query on the ETag fingerprint)
+QUERY_BUDGETS = [
+    ("GET", "/api/teacher/subjects/{subject_id}", "teacher", 2),
+    ("GET", "/api/teacher/subjects/{subject_id}/tasks", "teacher", 3),
+    ("GET", "/api/teacher/tasks/{task_id}", "teacher", 1),
+    ("GET", "/api/teacher/tasks/{task_id}/solutions", "teacher", 2),  # summaries: no content store lookup
+    ("GET", "/api/teacher/solutions/{solution_id}", "teacher", 2),
+    ("PUT", "/api/teacher/tasks/{task_id}", "teacher", 3),
+    ("POST", "/api/teacher/solutions/{solution_id}/evaluate", "teacher", 6),  # + row lock, task_stats upsert, content lookup
+    ("GET", "/api/teacher/subjects/{subject_id}/gradebook", "teacher", 2),
+    ("GET", "/api/student/subjects", None, 2),
+    ("GET", "/api/student/subjects/{subject_id}/tasks", "student", 4),
+    ("GET", "/api/student/tasks/{task_id}/my-solutions", "student", 1),
+    ("GET", "/api/student/solutions/{solution_id}", "student", 2),
+    ("POST", "/api/student/tasks/{task_id}/submit", "student", 5),  # + task_stats upsert, blob insert
+    ("GET", "/api/student/gradebook", "student", 1),
+]
+
+def seed(client):
+    """Create a teacher, a student, a subject with a task and a few solutions."""
+    from app import auth, models
+    from app.database import SessionLocal
+    from app.submissions import insert_solutions
+
+    with SessionLocal() as db:
+        teacher = models.User(username="budget_teacher", email="budget_teacher@test.com",
+                              hashed_password=auth.get_password_hash("pw"), is_teacher=True)
+        student = models.User(username="budget_student", email="budget_student@test.com",
+                              hashed_password=auth.get_password_hash("pw"))
+        db.add_all([teacher, student])
+        db.flush()
+        subject = models.Subject(name="Budget", code="BUDGET", credits=5, teacher_id=teacher.id)
+        subject.students.append(student)
+        db.add(subject)
+        db.flush()
+        task = models.Task(name="Budget task", description="d", points=10, subject_id=subject.id)
+        db.add(task)
+        db.flush()
+        solutions = insert_solutions(db, [
+            {"content": f"answer {i}", "task_id": task.id, "student_id": student.id} for i in range(5)
+        ])
+        db.commit()
+        ids = {"subject_id": subject.id, "task_id": task.id, "solution_id": solutions[0].id}
+
+    headers = {}
+    for role in ("teacher", "student"):
+        response = client.post("/api/auth/login", data={"username": f"budget_{role}@test.com", "password": "pw"})
+        headers[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        client.get("/api/auth/me", headers=headers[role])
+    return ids, headers
+
+BODIES = {
+    "/api/teacher/tasks/{task_id}": {"name": "Budget task", "description": "d", "points": 10},
+    "/api/teacher/solutions/{solution_id}/evaluate": {"points_earned": 5},
+    "/api/student/tasks/{task_id}/submit": {"content": "answer", "task_id": 0},
+}
+
+def configure_environment(name):
+    """Point the app at a throwaway SQLite file with cheap password hashing."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), name)}")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+def call_endpoints(client, ids, headers):
+    """Yield ``(method, template, budget, response)`` for every budgeted endpoint."""
+    for method, template, role, budget in QUERY_BUDGETS:
+        body = BODIES.get(template) if method != "GET" else None
+        response = client.request(method, template.format(**ids), json=body, headers=headers.get(role, {}))
+        yield method, template, budget, response
+
+def main():
+    configure_environment("budget.db")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    failures = 0
+    with TestClient(app) as client:
+        ids, headers = seed(client)
+        for method, template, budget, response in call_endpoints(client, ids, headers):
+            used = int(response.headers["x-db-queries"])
+            ok = response.status_code < 400 and used <= budget
+            failures += not ok
+            print(f"{'ok ' if ok else 'FAIL'} {method:<5} {template:<48} {used:>2}/{budget} statements  HTTP {response.status_code}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Compare list-endpoint serialization paths: rows/sec and allocations.
+
+For the catalog, a subject's task list and a task's solution list (summary),
+runs the same page through:
+
+  orm      ORM objects -> response model validation -> stdlib json
+           (what FastAPI does with response_model)
+  columns  column rows -> dicts -> pydantic-core dump_json
+  orjson   column rows -> dicts -> orjson (the path the endpoints use)
+
+and checks that all three produce byte-identical JSON bodies:
+
+    python -m benchmarks.read_path --solutions 50000 --limit 500 --repeat 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+from typing import List
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=500)
+    parser.add_argument("--solutions", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=500, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'read.db')}")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    from pydantic import TypeAdapter
+    from sqlalchemy import func
+    from app import models, schemas, serialization
+    from app.database import SessionLocal
+    from generate_data import generate
+
+    generate(Namespace(
+        teachers=5, subjects=args.subjects, students=500, enrollments_per_student=3, tasks_per_subject=args.limit // 50 or 1,
+        solutions=args.solutions, graded_fraction=0.5, days=30, seed=7, prefix="read", password="password123",
+        batch_size=5000,
+    ))
+
+    db = SessionLocal()
+    busiest_task = db.query(models.Solution.task_id).group_by(models.Solution.task_id).order_by(
+        func.count().desc()
+    ).limit(1).scalar()
+    subject_id = db.query(models.Task.subject_id).filter(models.Task.id == busiest_task).scalar()
+    cases = [
+        ("catalog", models.Subject, schemas.Subject, [models.Subject.deleted_at == None]),
+        ("tasks", models.Task, schemas.Task, [models.Task.subject_id == subject_id]),
+        ("solutions", models.Solution, schemas.SolutionSummary, [models.Solution.task_id == busiest_task]),
+    ]
+
+    def orm_path(model, schema, filters):
+        adapter = TypeAdapter(List[schema])
+        objects = db.query(model).filter(*filters).order_by(model.id).limit(args.limit).all()
+        data = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+        body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+        db.expunge_all()
+        return body
+
+    def column_path(model, schema, filters, use_orjson):
+        query = db.query(*serialization.schema_columns(model, schema)).filter(*filters)
+        rows = serialization.as_dicts(query.order_by(model.id).limit(args.limit))
+        if use_orjson:
+            return serialization.dumps(rows)
+        return serialization._rows_adapter.dump_json(rows)
+
+    paths = {
+        "orm": orm_path,
+        "columns": lambda *a: column_path(*a, use_orjson=False),
+    }
+    if serialization.orjson is not None:
+        paths["orjson"] = lambda *a: column_path(*a, use_orjson=True)
+
+    print(f"{'endpoint':<10} {'path':<8} {'rows':>5} {'req/s':>9} {'rows/s':>11} {'peak KB/req':>12}")
+    for name, model, schema, filters in cases:
+        reference = None
+        for path_name, path in paths.items():
+            body = path(model, schema, filters)
+            rows = len(json.loads(body))
+            if reference is None:
+                reference = body
+            elif body != reference:
+                raise SystemExit(f"{name}: {path_name} output is not byte-identical to orm")
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                path(model, schema, filters)
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            path(model, schema, filters)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:<10} {path_name:<8} {rows:>5} {args.repeat / elapsed:>9.1f} "
+                  f"{rows * args.repeat / elapsed:>11,.0f} {peak / 1024:>12.1f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
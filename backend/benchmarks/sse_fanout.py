@@ -0,0 +1,146 @@
+"""Idle SSE connections per worker: memory and fan-out latency.
+
+Starts one uvicorn worker on a fresh SQLite database, opens ``--connections``
+teacher event streams for one subject, then submits and evaluates a solution
+and measures how long each event takes to reach every stream:
+
+    python -m benchmarks.sse_fanout --connections 2000
+
+Reports the server's resident memory before and after connecting, per open
+stream, and p50/max delivery latency.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def open_stream(port: int, path: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    while not (await reader.readline()).startswith(b"retry:"):
+        pass
+    return reader, writer
+
+
+async def wait_for_event(reader, event_type: bytes) -> float:
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("stream closed")
+        if line.strip() == b"event: " + event_type:
+            return time.perf_counter()
+
+
+def setup(base_url: str):
+    client = httpx.Client(base_url=base_url)
+    token = lambda email, password: client.post(
+        "/api/auth/login", data={"username": email, "password": password}
+    ).json()["access_token"]
+    teacher = token("teacher1@test.com", "teacher123")
+    headers = {"Authorization": f"Bearer {teacher}"}
+    subject_id = client.post("/api/teacher/subjects", json={"name": "Fan-out", "code": "SSE1", "credits": 5}, headers=headers).json()["id"]
+    task_id = client.post(
+        f"/api/teacher/subjects/{subject_id}/tasks",
+        json={"name": "Task", "description": "d", "points": 10, "subject_id": subject_id}, headers=headers,
+    ).json()["id"]
+    client.post("/api/auth/register", json={"username": "sse-student", "email": "sse@test.com", "password": "password"})
+    student = {"Authorization": f"Bearer {token('sse@test.com', 'password')}"}
+    client.post(f"/api/student/subjects/{subject_id}/enroll", headers=student)
+    return client, headers, student, subject_id, task_id
+
+
+async def measure(label, streams, event_type, action):
+    waiters = [asyncio.create_task(wait_for_event(reader, event_type)) for reader, _ in streams]
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    await asyncio.to_thread(action)
+    latencies = sorted(arrived - start for arrived in await asyncio.gather(*waiters))
+    p50 = latencies[len(latencies) // 2] * 1000
+    print(f"{label:<20} delivered to {len(latencies)} streams  p50 {p50:.1f} ms  max {latencies[-1] * 1000:.1f} ms")
+
+
+async def run(args, port, server):
+    client, headers, student, subject_id, task_id = await asyncio.to_thread(setup, f"http://127.0.0.1:{port}")
+    before = rss_kb(server.pid)
+    stream_token = (await asyncio.to_thread(client.post, "/api/auth/stream-token", headers=headers)).json()["token"]
+    path = f"/api/teacher/subjects/{subject_id}/events?token={stream_token}"
+    streams = []
+    for start in range(0, args.connections, 200):
+        streams += await asyncio.gather(*(open_stream(port, path) for _ in range(start, min(args.connections, start + 200))))
+    await asyncio.sleep(1)
+    after = rss_kb(server.pid)
+    print(f"server RSS {before / 1024:.1f} MB -> {after / 1024:.1f} MB with {len(streams)} streams "
+          f"({(after - before) / max(len(streams), 1):.1f} KB per stream)")
+
+    solution = {}
+
+    def submit():
+        response = client.post(f"/api/student/tasks/{task_id}/submit", json={"content": "x = 1", "task_id": task_id}, headers=student)
+        solution.update(response.json())
+
+    def evaluate():
+        client.post(f"/api/teacher/solutions/{solution['id']}/evaluate", json={"points_earned": 7}, headers=headers)
+
+    await measure("solution.created", streams, b"solution.created", submit)
+    await measure("solution.evaluated", streams, b"solution.evaluated", evaluate)
+    gauge = lambda: next(line for line in client.get("/metrics").text.splitlines() if line.startswith("sse_connections"))
+    open_gauge = gauge()
+    for _, writer in streams:
+        writer.close()
+    await asyncio.sleep(0.5)
+    print(f"{open_gauge} while open, {gauge()} after closing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'sse.db')}", BCRYPT_ROUNDS="4",
+        PASSWORD_HASH_WORKERS="0", RATE_LIMITING="false",
+    )
+    subprocess.run([sys.executable, "seed.py"], env=env, check=True, capture_output=True)
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(env, AUTO_MIGRATE="false"),
+    )
+    try:
+        for _ in range(100):
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        asyncio.run(run(args, port, server))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
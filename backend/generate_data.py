@@ -0,0 +1,206 @@
+"""Populate the database with synthetic, production-sized data.
+
+Rows are written with bulk Core inserts in batches, and every generated user
+shares one precomputed password hash. The same --seed always produces the
+same data, on SQLite and PostgreSQL alike: timestamps are laid out before a
+fixed date, and even the bcrypt salt comes from the seed.
+
+    python generate_data.py --teachers 20 --subjects 200 --students 5000 \
+        --tasks-per-subject 20 --solutions 1000000
+
+All generated users log in with --password (default "password123") using
+<prefix>_teacher<N>@test.com / <prefix>_student<N>@test.com.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app import content_store, migrations, models, search, task_stats
+from app.auth import password_context
+from app.config import settings
+from app.database import engine
+
+# Generated submissions end here, so runs don't depend on the clock
+END_TIME = datetime(2025, 1, 1)
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+WORDS = (
+    "algebra calculus data systems network graphics security compilers logic "
+    "statistics physics chemistry biology history economics design ethics "
+    "databases algorithms robotics vision language theory practice advanced"
+).split()
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def next_id(connection, table):
+    return (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def insert_rows(connection, table, rows, batch_size, label, prepare=None):
+    count = 0
+    start = time.perf_counter()
+    for batch in batched(rows, batch_size):
+        if prepare:
+            prepare(connection, batch)
+        connection.execute(table.insert(), batch)
+        count += len(batch)
+    print(f"  {label:<12} {count:>10,} rows in {time.perf_counter() - start:6.1f}s")
+    return count
+
+
+def sync_sequence(connection, table):
+    # Explicit ids bypass PostgreSQL sequences; move them past the new rows
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+        ))
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    migrations.upgrade(engine)
+    # The salt's last character may only use the bits bcrypt keeps
+    salt = "".join(rng.choices(BCRYPT_ALPHABET, k=21)) + rng.choice(".Oeu")
+    password_hash = password_context().handler("bcrypt").using(salt=salt, rounds=settings.BCRYPT_ROUNDS).hash(args.password)
+    created_at = END_TIME - timedelta(days=args.days)
+
+    users = models.User.__table__
+    subjects = models.Subject.__table__
+    tasks = models.Task.__table__
+    solutions = models.Solution.__table__
+
+    with engine.begin() as connection:
+        first_user = next_id(connection, users)
+        teacher_ids = list(range(first_user, first_user + args.teachers))
+        student_ids = list(range(teacher_ids[-1] + 1 if teacher_ids else first_user,
+                                 (teacher_ids[-1] + 1 if teacher_ids else first_user) + args.students))
+
+        def user_rows():
+            for n, user_id in enumerate(teacher_ids):
+                yield {"id": user_id, "username": f"{args.prefix}_teacher{n}", "email": f"{args.prefix}_teacher{n}@test.com",
+                       "hashed_password": password_hash, "is_teacher": True, "created_at": created_at}
+            for n, user_id in enumerate(student_ids):
+                yield {"id": user_id, "username": f"{args.prefix}_student{n}", "email": f"{args.prefix}_student{n}@test.com",
+                       "hashed_password": password_hash, "is_teacher": False, "created_at": created_at}
+
+        print("Generating data:")
+        insert_rows(connection, users, user_rows(), args.batch_size, "users")
+
+        first_subject = next_id(connection, subjects)
+        subject_ids = list(range(first_subject, first_subject + args.subjects))
+
+        def subject_rows():
+            for n, subject_id in enumerate(subject_ids):
+                topic = " ".join(rng.sample(WORDS, 2)).title()
+                yield {"id": subject_id, "name": f"{topic} {n}", "code": f"{args.prefix.upper()}{n:05d}",
+                       "description": " ".join(rng.choices(WORDS, k=20)), "credits": rng.choice((3, 4, 5, 6)),
+                       "teacher_id": rng.choice(teacher_ids), "created_at": created_at, "updated_at": created_at}
+
+        insert_rows(connection, subjects, subject_rows(), args.batch_size, "subjects")
+
+        first_task = next_id(connection, tasks)
+        tasks_by_subject = {}
+        task_points = {}
+
+        def task_rows():
+            task_id = first_task
+            for subject_id in subject_ids:
+                tasks_by_subject[subject_id] = []
+                for n in range(args.tasks_per_subject):
+                    points = rng.choice((5, 10, 20, 50, 100))
+                    tasks_by_subject[subject_id].append(task_id)
+                    task_points[task_id] = points
+                    yield {"id": task_id, "name": f"Task {n + 1}", "points": points, "subject_id": subject_id,
+                           "description": " ".join(rng.choices(WORDS, k=40)),
+                           "created_at": created_at, "updated_at": created_at}
+                    task_id += 1
+
+        insert_rows(connection, tasks, task_rows(), args.batch_size, "tasks")
+
+        enrollments = []
+
+        def enrollment_rows():
+            per_student = min(args.enrollments_per_student, len(subject_ids))
+            for student_id in student_ids:
+                for subject_id in rng.sample(subject_ids, per_student):
+                    enrollments.append((student_id, subject_id))
+                    yield {"user_id": student_id, "subject_id": subject_id}
+
+        insert_rows(connection, models.student_subjects, enrollment_rows(), args.batch_size, "enrollments")
+
+        graded_enrollments = [pair for pair in enrollments if tasks_by_subject[pair[1]]]
+        first_solution = next_id(connection, solutions)
+        # Solution ids grow with submitted_at (gradebook "latest" and id-keyed
+        # paging rely on it): each row gets its own slice of the period, in id
+        # order, starting after any existing submissions
+        start = created_at
+        latest = connection.execute(select(func.max(solutions.c.submitted_at))).scalar()
+        if latest is not None and latest > start:
+            start = latest
+        step = args.days * 86400 / max(args.solutions, 1)
+
+        def solution_rows():
+            if not graded_enrollments:
+                return
+            for n in range(args.solutions):
+                student_id, subject_id = rng.choice(graded_enrollments)
+                task_id = rng.choice(tasks_by_subject[subject_id])
+                submitted_at = start + timedelta(seconds=(n + rng.random()) * step)
+                graded = rng.random() < args.graded_fraction
+                yield {
+                    "id": first_solution + n,
+                    "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 200))),
+                    "task_id": task_id,
+                    "student_id": student_id,
+                    "points_earned": rng.randint(0, task_points[task_id]) if graded else None,
+                    "submitted_at": submitted_at,
+                    "evaluated_at": submitted_at + timedelta(hours=rng.randint(1, 72)) if graded else None,
+                }
+
+        def store_contents(connection, batch):
+            refs = content_store.save(connection, [row.pop("content") for row in batch])
+            for row, (content_hash, size) in zip(batch, refs):
+                row["content_hash"], row["content_size"] = content_hash, size
+
+        insert_rows(connection, solutions, solution_rows(), args.batch_size, "solutions", prepare=store_contents)
+
+        for table in (users, subjects, tasks, solutions):
+            sync_sequence(connection, table)
+
+        # Bulk inserts bypass the incremental counters and the search index
+        task_stats.rebuild(connection)
+        search.rebuild(connection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teachers", type=int, default=10)
+    parser.add_argument("--subjects", type=int, default=50)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--enrollments-per-student", type=int, default=5)
+    parser.add_argument("--tasks-per-subject", type=int, default=10)
+    parser.add_argument("--solutions", type=int, default=50000, help="total solution rows")
+    parser.add_argument("--graded-fraction", type=float, default=0.7)
+    parser.add_argument("--days", type=int, default=120, help="spread submissions over this many days (up to 2025-01-01 on a fresh database)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="gen", help="username/email/code prefix, must be unique per run")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    if args.teachers < 1 and args.subjects:
+        parser.error("--subjects needs at least one teacher")
+    generate(args)
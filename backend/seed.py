@@ -1,8 +1,10 @@
+from app import migrations
 from app.database import SessionLocal
 from app.models import User
 from app.auth import get_password_hash
 
 def seed_database():
+    migrations.upgrade()
     db = SessionLocal()
     
     try:
@@ -0,0 +1,43 @@
+import api from './axios';
+
+// Subscribe to a server-sent event feed; returns a function that closes it.
+// EventSource cannot send headers, so the URL carries a short-lived stream
+// token rather than the login token, which would end up in access logs. The
+// stream token expires quickly: when the server refuses a reconnect, a new
+// one is fetched and the feed reopened, with a resync for missed events.
+export function subscribe(path, handlers) {
+  let source = null;
+  let retry = null;
+  let closed = false;
+  let opened = false;
+
+  const reopen = () => {
+    if (!closed) retry = setTimeout(open, 5000);
+  };
+
+  async function open() {
+    try {
+      const { data } = await api.post('/auth/stream-token');
+      if (closed) return;
+      source = new EventSource(`${api.defaults.baseURL}${path}?token=${encodeURIComponent(data.token)}`);
+      Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+      });
+      source.onerror = () => {
+        // The browser retries by itself, unless the server refused the stream
+        if (source.readyState === EventSource.CLOSED) reopen();
+      };
+      if (opened) handlers.resync?.();
+      opened = true;
+    } catch (error) {
+      reopen();
+    }
+  }
+
+  open();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+}
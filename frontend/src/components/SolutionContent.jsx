@@ -0,0 +1,45 @@
+import { useState } from 'react';
+import api from '../api/axios';
+
+// Solution lists arrive as summaries; the body is fetched when opened.
+export default function SolutionContent({ solution, path }) {
+  const [content, setContent] = useState(solution.content ?? null);
+  const [open, setOpen] = useState(solution.content != null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState('');
+
+  const toggle = async () => {
+    if (open) {
+      setOpen(false);
+      return;
+    }
+    setOpen(true);
+    if (content !== null) return;
+    setError('');
+    setLoading(true);
+    try {
+      const response = await api.get(path);
+      setContent(response.data.content);
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to load solution');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div className="bg-slate-900 p-3 sm:p-4 rounded-lg border border-slate-700">
+      <button
+        onClick={toggle}
+        className="text-xs sm:text-sm text-blue-400 hover:text-blue-300 font-medium"
+      >
+        {open ? 'Hide solution' : `Show solution (${solution.content_size ?? 0} bytes)`}
+      </button>
+      {open && loading && <p className="text-xs sm:text-sm text-slate-400 mt-2">Loading...</p>}
+      {open && error && <p className="text-xs sm:text-sm text-red-400 mt-2">{error}</p>}
+      {open && content !== null && (
+        <pre className="whitespace-pre-wrap text-xs sm:text-sm text-slate-300 overflow-x-auto mt-2">{content}</pre>
+      )}
+    </div>
+  );
+}
@@ -8,11 +8,30 @@ export default function BrowseSubjects() {
   const [subjects, setSubjects] = useState([]);
   const [mySubjects, setMySubjects] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [query, setQuery] = useState('');
+  const [results, setResults] = useState(null);
 
   useEffect(() => {
     fetchSubjects();
   }, []);
 
+  // Server-side full-text search, debounced while typing
+  useEffect(() => {
+    if (!query.trim()) {
+      setResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get('/student/subjects/search', { params: { q: query, limit: 50 } });
+        setResults(response.data);
+      } catch (error) {
+        console.error('Error searching subjects:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [query]);
+
   const fetchSubjects = async () => {
     try {
       const [allResponse, myResponse] = await Promise.all([
@@ -63,13 +82,20 @@ export default function BrowseSubjects() {
     </nav>
 
     <div className="container mx-auto p-4 sm:p-8">
-      {subjects.length === 0 ? (
+      <input
+        type="search"
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        placeholder="Search subjects by name, code or description..."
+        className="w-full mb-6 px-4 py-2.5 rounded-lg bg-slate-800 border border-slate-700 text-white placeholder-slate-500 focus:outline-none focus:border-blue-500 text-sm sm:text-base"
+      />
+      {(results ?? subjects).length === 0 ? (
         <div className="bg-slate-800 rounded-2xl shadow-2xl p-6 sm:p-8 text-center border border-slate-700">
-          <p className="text-slate-400">No subjects available yet.</p>
+          <p className="text-slate-400">{results ? 'No subjects match your search.' : 'No subjects available yet.'}</p>
         </div>
       ) : (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4 sm:gap-6">
-          {subjects.map((subject) => (
+          {(results ?? subjects).map((subject) => (
             <div key={subject.id} className="bg-slate-800 rounded-2xl shadow-2xl hover:shadow-blue-900/20 transition-all duration-300 border border-slate-700 transform hover:-translate-y-1">
               <div className="p-4 sm:p-6">
                 <h3 className="text-lg sm:text-xl font-bold mb-2 text-white">{subject.name}</h3>
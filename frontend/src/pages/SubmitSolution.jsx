@@ -1,6 +1,8 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../api/axios';
+import { subscribe } from '../api/events';
+import SolutionContent from '../components/SolutionContent';
 import toast from 'react-hot-toast';
 
 export default function SubmitSolution() {
@@ -17,6 +19,22 @@ export default function SubmitSolution() {
     fetchTaskAndSolutions();
   }, [id]);
 
+  // Grades arrive as events instead of reloading my solutions
+  useEffect(() => {
+    const taskId = parseInt(id);
+    return subscribe('/student/events', {
+      'solution.evaluated': (event) => {
+        if (event.task_id !== taskId) return;
+        setMySolutions((current) =>
+          current.map((s) =>
+            s.id === event.id ? { ...s, points_earned: event.points_earned, evaluated_at: event.evaluated_at } : s
+          )
+        );
+      },
+      resync: fetchTaskAndSolutions,
+    });
+  }, [id]);
+
   const fetchTaskAndSolutions = async () => {
     try {
       // We need to get task info, but we don't have a direct endpoint
@@ -133,9 +151,7 @@ export default function SubmitSolution() {
                     </span>
                   )}
                 </div>
-                <div className="bg-slate-900 p-3 sm:p-4 rounded-lg border border-slate-700">
-                  <pre className="whitespace-pre-wrap text-xs sm:text-sm text-slate-300 overflow-x-auto">{solution.content}</pre>
-                </div>
+                <SolutionContent solution={solution} path={`/student/solutions/${solution.id}`} />
               </div>
             ))}
           </div>
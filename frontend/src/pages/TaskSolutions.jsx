@@ -1,6 +1,8 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../api/axios';
+import { subscribe } from '../api/events';
+import SolutionContent from '../components/SolutionContent';
 
 export default function TaskSolutions() {
   const { id } = useParams();
@@ -14,6 +16,35 @@ export default function TaskSolutions() {
     fetchSolutions();
   }, [id]);
 
+  // Live updates for the task's subject instead of refetching everything
+  const subjectId = task?.subject_id;
+  useEffect(() => {
+    if (!subjectId) return;
+    const taskId = parseInt(id);
+    return subscribe(`/teacher/subjects/${subjectId}/events`, {
+      'solution.created': (event) => {
+        if (event.task_id !== taskId) return;
+        // The event carries the summary row; the body is fetched when opened
+        setSolutions((current) =>
+          current.some((s) => s.id === event.id) ? current : [...current, event]
+        );
+        setTask((current) => ({ ...current, total_solutions: (current.total_solutions || 0) + 1 }));
+      },
+      'solution.evaluated': (event) => {
+        if (event.task_id !== taskId) return;
+        updateSolution({ id: event.id, points_earned: event.points_earned, evaluated_at: event.evaluated_at });
+        setTask((current) => applyEvaluation(current, event.previous_points, event.points_earned));
+      },
+      'task.updated': (event) => {
+        if (event.id === taskId) setTask((current) => ({ ...current, ...event }));
+      },
+      resync: () => {
+        fetchTaskDetails();
+        fetchSolutions();
+      },
+    });
+  }, [id, subjectId]);
+
   const fetchTaskDetails = async () => {
     try {
       const response = await api.get(`/teacher/tasks/${id}`);
@@ -25,6 +56,10 @@ export default function TaskSolutions() {
     }
   };
 
+  const updateSolution = (updated) => {
+    setSolutions((current) => current.map((s) => (s.id === updated.id ? { ...s, ...updated } : s)));
+  };
+
   const fetchSolutions = async () => {
     try {
       const response = await api.get(`/teacher/tasks/${id}/solutions`);
@@ -90,7 +125,7 @@ export default function TaskSolutions() {
                 key={solution.id} 
                 solution={solution} 
                 taskPoints={task.points}
-                onEvaluated={fetchSolutions}
+                onEvaluated={updateSolution}
               />
             ))}
           </div>
@@ -101,6 +136,14 @@ export default function TaskSolutions() {
 );
 }
 
+// Task counters after one evaluation, moved the way the server's task_stats are
+function applyEvaluation(task, previousPoints, points) {
+  const evaluated = task.evaluated_solutions || 0;
+  const sum = (task.average_points || 0) * evaluated - (previousPoints ?? 0) + points;
+  const count = previousPoints == null ? evaluated + 1 : evaluated;
+  return { ...task, evaluated_solutions: count, average_points: count ? sum / count : null };
+}
+
 function SolutionCard({ solution, taskPoints, onEvaluated }) {
   const [showEvaluate, setShowEvaluate] = useState(false);
   const [points, setPoints] = useState(solution.points_earned || 0);
@@ -112,11 +155,11 @@ function SolutionCard({ solution, taskPoints, onEvaluated }) {
     setLoading(true);
 
     try {
-      await api.post(`/teacher/solutions/${solution.id}/evaluate`, {
+      const response = await api.post(`/teacher/solutions/${solution.id}/evaluate`, {
         points_earned: parseInt(points)
       });
       setShowEvaluate(false);
-      onEvaluated();
+      onEvaluated(response.data);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to evaluate');
     } finally {
@@ -155,9 +198,8 @@ function SolutionCard({ solution, taskPoints, onEvaluated }) {
         )}
       </div>
 
-      <div className="bg-slate-900 p-3 sm:p-4 rounded-lg mb-4 border border-slate-700">
-        <p className="text-xs sm:text-sm text-slate-400 mb-2">Solution:</p>
-        <pre className="whitespace-pre-wrap text-xs sm:text-sm text-slate-300 overflow-x-auto">{solution.content}</pre>
+      <div className="mb-4">
+        <SolutionContent solution={solution} path={`/teacher/solutions/${solution.id}`} />
       </div>
 
       {showEvaluate && !isEvaluated && (